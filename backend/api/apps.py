@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self) -> None:
+        # Обработчики сигналов, сбрасывающие кеш токенов.
+        from api import authentication  # noqa: F401
+        from core import warmup
+
+        if settings.WARMUP:
+            warmup.run()
@@ -0,0 +1,260 @@
+"""Асинхронные представления для чтения под ASGI.
+
+GET-запросы к спискам рецептов, тегам, ингредиентам и подпискам
+обрабатываются в цикле событий через асинхронный ORM Django и отдают
+тот же JSON, что и представления DRF (сериализаторы общие). Остальные
+методы передаются представлениям DRF в поток (`read_view`).
+Подключаются в api/urls.py при `ASYNC_READ_VIEWS`.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.authentication import CachedTokenAuthentication
+from api.filters import RecipeFilter
+from api.pagination import CustomPagination
+from api.serializers import (
+    IngredientSerializer,
+    RecipeReadSerializer,
+    TagSerializer,
+    UserSubscribeSerializer,
+)
+from api.views import (
+    batch_ids,
+    filter_recipes,
+    order_by_ids,
+    subscriptions_queryset,
+)
+from core.classes import requested_fields
+from recipes.models import Ingredient, Recipe, Tag
+
+authentication = CachedTokenAuthentication()
+# Тот же рендерер JSON, что у представлений DRF (настройка API_JSON).
+renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+
+def render(data, status: int = 200) -> HttpResponse:
+    if data is None:
+        # Как `Response` DRF без данных: пустое тело без Content-Type.
+        response = HttpResponse(status=status)
+        del response['Content-Type']
+        return response
+    return HttpResponse(
+        renderer.render(data),
+        status=status,
+        content_type=renderer.media_type,
+    )
+
+
+def read_view(async_view, fallback):
+    """GET и HEAD обрабатывает `async_view`, остальное - `fallback` DRF.
+
+    Ошибки DRF (`APIException`) отдаются в формате DRF.
+
+    """
+    fallback = sync_to_async(fallback)
+
+    async def view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method not in ('GET', 'HEAD'):
+            return await fallback(request, *args, **kwargs)
+        try:
+            return await async_view(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            response = render(
+                (
+                    error.detail
+                    if isinstance(error.detail, (list, dict))
+                    else {'detail': error.detail}
+                ),
+                error.status_code,
+            )
+            if error.status_code == 401:
+                response['WWW-Authenticate'] = authentication.keyword
+            return response
+
+    # Как и у представлений DRF: аутентификация по токену, без CSRF.
+    view.csrf_exempt = True
+    return view
+
+
+async def authenticate(request: HttpRequest) -> None:
+    credentials = await authentication.aauthenticate(request)
+    request.user = credentials[0] if credentials else AnonymousUser()
+
+
+async def subscribed_ids(request: HttpRequest) -> set[int]:
+    """Подписки пользователя для `UserSerializer.get_is_subscribed`."""
+    if request.user.is_anonymous:
+        return set()
+    return {
+        author
+        async for author in request.user.subscriptions.values_list(
+            'author_id',
+            flat=True,
+        )
+    }
+
+
+async def paginate(request: HttpRequest, queryset: QuerySet) -> tuple:
+    """Страница выборки как в `CustomPagination`.
+
+    Returns:
+        tuple: Объекты страницы и функция, собирающая ответ
+        `count`/`next`/`previous`/`results`.
+
+    """
+    pagination = CustomPagination()
+    page_size = pagination.page_size
+    try:
+        page_size = int(request.GET[pagination.page_size_query_param])
+    except (KeyError, ValueError):
+        pass
+    if page_size <= 0:
+        page_size = pagination.page_size
+    paginator = Paginator(range(await queryset.acount()), page_size)
+    number = request.GET.get(pagination.page_query_param, 1)
+    if number in pagination.last_page_strings:
+        number = paginator.num_pages
+    try:
+        page = paginator.page(number)
+    except InvalidPage as error:
+        raise exceptions.NotFound(
+            pagination.invalid_page_message.format(
+                page_number=number,
+                message=str(error),
+            ),
+        )
+    bottom = (page.number - 1) * page_size
+    objects = [obj async for obj in queryset[bottom : bottom + page_size]]
+    url = request.build_absolute_uri()
+    param = pagination.page_query_param
+
+    def response(results: list) -> dict:
+        previous = None
+        if page.has_previous():
+            previous = (
+                remove_query_param(url, param)
+                if page.previous_page_number() == 1
+                else replace_query_param(
+                    url,
+                    param,
+                    page.previous_page_number(),
+                )
+            )
+        return {
+            'count': paginator.count,
+            'next': (
+                replace_query_param(url, param, page.next_page_number())
+                if page.has_next()
+                else None
+            ),
+            'previous': previous,
+            'results': results,
+        }
+
+    return objects, response
+
+
+async def recipes_queryset(
+    request: HttpRequest,
+    fields: frozenset[str] | None = None,
+) -> QuerySet[Recipe]:
+    queryset = filter_recipes(
+        Recipe.objects.select_related('author'),
+        request.user,
+        request.GET,
+        fields,
+    )
+    if 'tags' not in request.GET:
+        return queryset
+
+    # Проверка слагов тегов обращается к базе, она выполняется в потоке.
+    def filter_tags() -> QuerySet[Recipe]:
+        filterset = RecipeFilter(request.GET, queryset, request=request)
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+        return filterset.qs
+
+    return await sync_to_async(filter_tags)()
+
+
+async def recipe_list(request: HttpRequest) -> HttpResponse:
+    await authenticate(request)
+    fields = requested_fields(request.GET, RecipeReadSerializer.Meta.fields)
+    queryset = await recipes_queryset(request, fields)
+    if 'ids' in request.GET:
+        # Как `RecipeViewSet.list` с `?ids=`: без пагинации.
+        ids = batch_ids(request.GET)
+        recipes, missing = order_by_ids(
+            [recipe async for recipe in queryset.filter(pk__in=ids)],
+            ids,
+        )
+
+        def response(results: list) -> dict:
+            return {'results': results, 'missing': missing}
+
+    else:
+        recipes, response = await paginate(request, queryset)
+    context = {'request': request, 'fields': fields}
+    if recipes and (fields is None or 'author' in fields):
+        context['subscribed_ids'] = await subscribed_ids(request)
+    serializer = RecipeReadSerializer(recipes, many=True, context=context)
+    return render(response(serializer.data))
+
+
+async def recipe_detail(request: HttpRequest, pk: str) -> HttpResponse:
+    await authenticate(request)
+    fields = requested_fields(request.GET, RecipeReadSerializer.Meta.fields)
+    queryset = await recipes_queryset(request, fields)
+    try:
+        recipe = await queryset.aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise exceptions.NotFound
+    context = {'request': request, 'fields': fields}
+    if fields is None or 'author' in fields:
+        context['subscribed_ids'] = await subscribed_ids(request)
+    return render(RecipeReadSerializer(recipe, context=context).data)
+
+
+async def tag_list(request: HttpRequest) -> HttpResponse:
+    tags = [tag async for tag in Tag.objects.all()]
+    return render(TagSerializer(tags, many=True).data)
+
+
+async def ingredient_list(request: HttpRequest) -> HttpResponse:
+    queryset = Ingredient.objects.select_related('unit')
+    name = request.GET.get('name')
+    if name:
+        queryset = queryset.filter(name__icontains=name)
+    ingredients = [ingredient async for ingredient in queryset]
+    return render(IngredientSerializer(ingredients, many=True).data)
+
+
+async def subscriptions(request: HttpRequest) -> HttpResponse:
+    await authenticate(request)
+    if request.user.is_anonymous:
+        # Как `UserViewSet.subscriptions`: 401 без тела.
+        return render(None, 401)
+    fields = requested_fields(
+        request.GET,
+        UserSubscribeSerializer.Meta.fields,
+    )
+    authors, response = await paginate(
+        request,
+        subscriptions_queryset(
+            request.user,
+            request.GET.get('recipes_limit'),
+            fields,
+        ),
+    )
+    context = {'request': request, 'fields': fields}
+    if authors and (fields is None or 'is_subscribed' in fields):
+        context['subscribed_ids'] = await subscribed_ids(request)
+    serializer = UserSubscribeSerializer(authors, many=True, context=context)
+    return render(response(serializer.data))
@@ -0,0 +1,133 @@
+"""Аутентификация по токену без запроса к базе на каждый вызов API."""
+
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpRequest
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+
+from core.cache import LRUCache, is_shared
+from core.metrics import record_cache
+
+User = get_user_model()
+
+# Поля пользователя в снимке. Хеш пароля в кеш не попадает, при
+# обращении он загружается из базы как отложенное поле.
+USER_FIELDS = tuple(
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname != 'password'
+)
+
+local_tokens = LRUCache(
+    settings.AUTH_TOKEN_CACHE_SIZE,
+    settings.AUTH_TOKEN_LOCAL_TTL,
+)
+# Кеш процесса на `AUTH_TOKEN_CACHE_TTL` продлил бы жизнь отозванного
+# токена в остальных воркерах, поэтому второй уровень - только общий кеш.
+SHARED_CACHE = is_shared()
+
+
+def cache_key(key: str) -> str:
+    return 'auth-token:' + sha256(key.encode()).hexdigest()
+
+
+def invalidate(*keys: str) -> None:
+    """Удаляет снимки токенов из кеша процесса и общего кеша."""
+    cache_keys = [cache_key(key) for key in keys]
+    for name in cache_keys:
+        local_tokens.delete(name)
+    if SHARED_CACHE:
+        cache.delete_many(cache_keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` со снимками пользователей в кеше.
+
+    Снимок ищется сначала в LRU процесса (`AUTH_TOKEN_LOCAL_TTL`), затем
+    в общем кеше Django (`AUTH_TOKEN_CACHE_TTL`, только при `CACHE_URL`);
+    база запрашивается только при промахе. Снимки удаляются при удалении
+    токена (в том числе при выходе через djoser) и при сохранении
+    пользователя, например при снятии `is_active`: из LRU воркера,
+    обработавшего запрос, и из общего кеша. Остальные воркеры могут
+    принимать отозванный токен из своего LRU не дольше
+    `AUTH_TOKEN_LOCAL_TTL`.
+
+    """
+
+    def authenticate_credentials(self, key: str) -> tuple[User, Token]:
+        credentials = self.cached_credentials(key)
+        record_cache('auth_token', credentials is not None)
+        return credentials or self.fetch_credentials(key)
+
+    async def aauthenticate(
+        self,
+        request: HttpRequest,
+    ) -> tuple[User, Token] | None:
+        """`authenticate` для асинхронных представлений.
+
+        При попадании в кеш обходится без потока и базы данных.
+
+        """
+        auth = get_authorization_header(request).split()
+        if len(auth) == 2 and auth[0].lower() == self.keyword.lower().encode():
+            try:
+                key = auth[1].decode()
+            except UnicodeError:
+                key = None
+            credentials = key and self.cached_credentials(key)
+            if credentials:
+                record_cache('auth_token', True)
+                return credentials
+        return await sync_to_async(self.authenticate)(request)
+
+    def cached_credentials(self, key: str) -> tuple[User, Token] | None:
+        """Пользователь и токен из снимка в кеше или `None`."""
+        name = cache_key(key)
+        snapshot = local_tokens.get(name)
+        if snapshot is None:
+            snapshot = cache.get(name) if SHARED_CACHE else None
+            if snapshot is None:
+                return None
+            local_tokens.set(name, snapshot)
+
+        created, values = snapshot
+        user = User.from_db(router.db_for_read(User), USER_FIELDS, values)
+        token = Token(key=key, user=user, created=created)
+        token._state.adding = False
+        return user, token
+
+    def fetch_credentials(self, key: str) -> tuple[User, Token]:
+        """Проверяет токен по базе и сохраняет снимок в кеш."""
+        user, token = super().authenticate_credentials(key)
+        snapshot = (
+            token.created,
+            tuple(getattr(user, field) for field in USER_FIELDS),
+        )
+        if SHARED_CACHE:
+            cache.set(cache_key(key), snapshot, settings.AUTH_TOKEN_CACHE_TTL)
+        local_tokens.set(cache_key(key), snapshot)
+        return user, token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance: Token, **kwargs) -> None:
+    invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, created: bool, **kwargs) -> None:
+    if not created:
+        invalidate(
+            *Token.objects.filter(user=instance).values_list('key', flat=True),
+        )
@@ -0,0 +1,100 @@
+"""Бюджеты количества SQL-запросов для эндпоинтов API.
+
+Каждый эндпоинт вызывается для всех значений `sizes`, подставляемых
+в `{size}`: число запросов не должно зависеть от размера и не должно
+превышать `budget`. Проверка выполняется командой `check_query_budgets`.
+В путях доступны также `{recipe}` и `{user}` - `id` рецепта и автора
+из тестовых данных, `{ids}` - `id` первых `size` рецептов через запятую.
+Токен пользователя к началу проверки уже в кеше аутентификации, поэтому
+поиск токена в бюджеты не входит.
+"""
+
+from typing import NamedTuple
+
+
+class QueryBudget(NamedTuple):
+    name: str
+    path: str
+    budget: int
+    sizes: tuple[int, ...] = (0,)
+    method: str = 'get'
+    authenticated: bool = True
+    # Пути запросов пакета для POST /api/batch/, в них те же подстановки.
+    batch: tuple[str, ...] = ()
+
+
+QUERY_BUDGETS = (
+    QueryBudget('tags', '/api/tags/', 1, authenticated=False),
+    QueryBudget('ingredients', '/api/ingredients/?name=и', 1),
+    QueryBudget(
+        'recipes_anonymous',
+        '/api/recipes/?limit={size}',
+        4,
+        (6, 60),
+        authenticated=False,
+    ),
+    QueryBudget('recipes', '/api/recipes/?limit={size}', 5, (6, 60)),
+    QueryBudget(
+        'recipes_favorited',
+        '/api/recipes/?limit={size}&is_favorited=1',
+        5,
+        (6, 60),
+    ),
+    QueryBudget(
+        'recipes_sparse',
+        '/api/recipes/?limit={size}'
+        '&fields=id,name,image,cooking_time,is_favorited,is_in_shopping_cart',
+        2,
+        (6, 60),
+    ),
+    QueryBudget('recipe_detail', '/api/recipes/{recipe}/', 4),
+    QueryBudget('recipes_batch', '/api/recipes/?ids={ids}', 4, (1, 10, 100)),
+    QueryBudget('users', '/api/users/?limit={size}', 3, (6, 60)),
+    QueryBudget('user_detail', '/api/users/{user}/', 2),
+    QueryBudget('users_me', '/api/users/me/', 0),
+    QueryBudget(
+        'subscriptions',
+        '/api/users/subscriptions/?limit={size}',
+        4,
+        (6, 60),
+    ),
+    QueryBudget(
+        'subscriptions_sparse',
+        '/api/users/subscriptions/?limit={size}&omit=recipes,is_subscribed',
+        2,
+        (6, 60),
+    ),
+    QueryBudget(
+        'subscriptions_recipes_limit',
+        '/api/users/subscriptions/?recipes_limit={size}',
+        4,
+        (1, 3, 10),
+    ),
+    QueryBudget(
+        'download_shopping_cart',
+        '/api/recipes/download_shopping_cart/',
+        2,
+    ),
+    QueryBudget(
+        'shopping_cart_summary',
+        '/api/recipes/shopping_cart_summary/',
+        2,
+    ),
+    # Сумма бюджетов запросов пакета и точка сохранения, в которой
+    # проверка выполняет POST.
+    QueryBudget(
+        'batch',
+        '/api/batch/',
+        12,
+        (6, 60),
+        'post',
+        batch=(
+            '/api/users/me/',
+            '/api/tags/',
+            '/api/recipes/?limit={size}',
+            '/api/users/subscriptions/?limit={size}',
+        ),
+    ),
+    # Вместе с BEGIN/COMMIT: рецепт создаётся в одной транзакции.
+    QueryBudget('recipe_create', '/api/recipes/', 14, (2, 10), 'post'),
+)
@@ -0,0 +1,260 @@
+import io
+import json
+from pathlib import Path
+from typing import Callable
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchmark
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Размеры наборов данных: аргументы для generate_fake_data.
+DATASETS = {
+    'small': {
+        'users': 50,
+        'recipes': 300,
+        'favorites': 1000,
+        'carts': 500,
+        'subscriptions': 300,
+    },
+    'medium': {
+        'users': 500,
+        'recipes': 5000,
+        'favorites': 20000,
+        'carts': 8000,
+        'subscriptions': 5000,
+    },
+    'large': {
+        'users': 2000,
+        'recipes': 50000,
+        'favorites': 200000,
+        'carts': 80000,
+        'subscriptions': 50000,
+    },
+}
+
+
+def load_dataset(size: str, seed: int) -> None:
+    """Заполняет пустую базу набором данных `size` из `DATASETS`."""
+    call_command('flush', interactive=False, verbosity=0)
+    call_command('seed_units', verbosity=0, stdout=io.StringIO())
+    call_command('load_ingredients', verbosity=0, stdout=io.StringIO())
+    call_command(
+        'generate_fake_data',
+        verbosity=0,
+        seed=seed,
+        images=5,
+        **DATASETS[size],
+    )
+
+
+def rolled_back(func: Callable[[], object]) -> Callable[[], None]:
+    """Выполняет `func` в транзакции, которая затем откатывается."""
+
+    def wrapper() -> None:
+        with transaction.atomic():
+            func()
+            transaction.set_rollback(True)
+
+    return wrapper
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время, количество запросов и пик памяти основных '
+        'эндпоинтов API на синтетических данных нескольких размеров. '
+        'Данные создаются во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            choices=DATASETS,
+            default=('small', 'medium'),
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output',
+            help='Файл для сохранения результатов в JSON.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON с базовыми результатами для поиска регрессий.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Допустимый рост времени и памяти (доля), по умолчанию 0.2.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(
+                Path(options['compare']).read_text(encoding='utf8'),
+            )['results']
+        self.repeat = max(options['repeat'], 1)
+        self.seed = options['seed']
+        self.verbosity = options['verbosity']
+
+        results = {}
+        with benchmark.test_database():
+            for size in options['sizes']:
+                results[size] = self._run_dataset(size)
+
+        if options['output']:
+            benchmark.save(results, Path(options['output']))
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+        if baseline is not None:
+            regressions = benchmark.compare(
+                baseline,
+                results,
+                options['threshold'],
+            )
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'Найдено регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
+
+    def _run_dataset(self, size: str) -> dict:
+        load_dataset(size, self.seed)
+        results = {}
+        for name, func in self._scenarios().items():
+            results[name] = benchmark.measure(func, self.repeat)
+            if self.verbosity:
+                self.stdout.write(
+                    '{size}/{name}: {median_ms} мс, запросов {queries}, '
+                    'память {peak_kb} КБ'.format(
+                        size=size,
+                        name=name,
+                        **results[name],
+                    ),
+                )
+        return results
+
+    def _scenarios(self) -> dict[str, Callable[[], object]]:
+        """Сценарии для пользователя с самой большой корзиной."""
+        user = (
+            User.objects.annotate(carts=Count('shopping_cart'))
+            .order_by('-carts', 'id')
+            .first()
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=(
+                f'Token {Token.objects.get_or_create(user=user)[0].key}'
+            ),
+        )
+        popular = (
+            Recipe.objects.annotate(favorites=Count('in_favorites'))
+            .order_by('-favorites', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        ingredients = [
+            {'id': pk, 'amount': 100}
+            for pk in Ingredient.objects.order_by('id').values_list(
+                'id',
+                flat=True,
+            )[:5]
+        ]
+        recipe = {
+            'name': 'Рецепт для замеров',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': benchmark.image_base64(),
+            'tags': tags[:2],
+            'ingredients': ingredients,
+        }
+        own = self._request(client, 'post', '/api/recipes/', 201, recipe)()
+        recipe.pop('image')
+        recipe['name'] = 'Рецепт для замеров, изменённый'
+
+        return {
+            'recipes_list': self._request(
+                client,
+                'get',
+                '/api/recipes/?limit=6',
+            ),
+            'recipes_list_filtered': self._request(
+                client,
+                'get',
+                '/api/recipes/?limit=6&is_in_shopping_cart=1'
+                '&tags=breakfast&tags=lunch',
+            ),
+            'recipe_retrieve': self._request(
+                client,
+                'get',
+                f'/api/recipes/{popular}/',
+            ),
+            'subscriptions': self._request(
+                client,
+                'get',
+                '/api/users/subscriptions/?recipes_limit=3',
+            ),
+            'ingredients_search': self._request(
+                client,
+                'get',
+                '/api/ingredients/?name=мо',
+            ),
+            'download_shopping_cart': self._request(
+                client,
+                'get',
+                '/api/recipes/download_shopping_cart/',
+            ),
+            'recipe_create': rolled_back(
+                self._request(
+                    client,
+                    'post',
+                    '/api/recipes/',
+                    201,
+                    {
+                        **recipe,
+                        'image': benchmark.image_base64(),
+                        'name': 'Новый',
+                    },
+                ),
+            ),
+            'recipe_update': rolled_back(
+                self._request(
+                    client,
+                    'patch',
+                    f'/api/recipes/{own["id"]}/',
+                    200,
+                    recipe,
+                ),
+            ),
+        }
+
+    @staticmethod
+    def _request(
+        client: APIClient,
+        method: str,
+        url: str,
+        expected: int = 200,
+        data: dict | None = None,
+    ) -> Callable[[], dict]:
+        """Запрос к API с проверкой кода ответа."""
+
+        def send() -> dict:
+            response = getattr(client, method)(url, data, format='json')
+            if response.status_code != expected:
+                raise CommandError(
+                    f'{method.upper()} {url}: {response.status_code} '
+                    f'{response.content[:200]!r}',
+                )
+            return response.json() if data is not None else {}
+
+        return send
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from core import benchmark
+
+# Режимы работы с соединениями: переменные окружения для settings.py.
+MODES = {
+    'no_persistence': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': ''},
+    'persistent': {'DB_CONN_MAX_AGE': '60', 'DB_POOL': ''},
+    'local_pool': {'DB_POOL': 'local'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку запросов к API при новом соединении с '
+        'PostgreSQL на каждый запрос, постоянных соединениях и пуле. '
+        'Каждый режим запускается в отдельном процессе, запросы проходят '
+        'через WSGI-обработчик Django со всеми сигналами запроса.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--path', default='/api/tags/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--pgbouncer',
+            metavar='HOST:PORT',
+            help='Добавить режим работы через PgBouncer.',
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument('--run', action='store_true', help='Служебный.')
+
+    def handle(self, *args, **options) -> None:
+        if options['run']:
+            self._run(options)
+            return
+        if connection.vendor != 'postgresql':
+            raise CommandError('Замер имеет смысл только для PostgreSQL.')
+
+        modes = dict(MODES)
+        if options['pgbouncer']:
+            host, _, port = options['pgbouncer'].partition(':')
+            modes['pgbouncer'] = {
+                'DB_POOL': 'pgbouncer',
+                'DB_HOST': host,
+                'DB_PORT': port or '6432',
+            }
+        results = {}
+        for mode, env in modes.items():
+            results[mode] = self._measure(env, options)
+
+        self.stdout.write(
+            f'{"режим":<16}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"соединений":>12}',
+        )
+        for mode, row in results.items():
+            self.stdout.write(
+                f'{mode:<16}{row["p50"]:>10.2f}{row["p95"]:>10.2f}'
+                f'{row["p99"]:>10.2f}{row["connections"]:>12}',
+            )
+        if options['output']:
+            benchmark.save(results, Path(options['output']))
+
+    def _measure(self, env: dict, options: dict) -> dict:
+        """Запускает замер в отдельном процессе с настройками режима."""
+        process = subprocess.run(
+            (
+                sys.executable,
+                'manage.py',
+                'benchmark_connections',
+                '--run',
+                '--path',
+                options['path'],
+                '--requests',
+                str(options['requests']),
+                '--warmup',
+                str(options['warmup']),
+            ),
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        latencies, connections = json.loads(process.stdout.splitlines()[-1])
+        return {
+            'requests': len(latencies),
+            'connections': connections,
+            **benchmark.percentiles(latencies),
+        }
+
+    def _run(self, options: dict) -> None:
+        """Выполняет запросы в текущем процессе и печатает задержки."""
+        application = get_wsgi_application()
+        factory = RequestFactory()
+        created = []
+        connection_created.connect(
+            lambda sender, connection, **kwargs: created.append(
+                connection.connection,
+            ),
+            weak=False,
+        )
+
+        def start_response(status: str, headers: list) -> None:
+            if not status.startswith('200'):
+                raise CommandError(f'{options["path"]} вернул {status}')
+
+        def request() -> None:
+            environ = factory.get(options['path']).environ
+            response = application(environ, start_response)
+            b''.join(response)
+            # Закрытие ответа отправляет request_finished и закрывает
+            # или сохраняет соединение, как в gunicorn.
+            response.close()
+
+        for _ in range(options['warmup']):
+            request()
+        created.clear()
+        latencies = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            request()
+            latencies.append(time.perf_counter() - started)
+        # Из пула приходит то же соединение драйвера, считаются только
+        # новые.
+        physical = len({id(raw) for raw in created})
+        self.stdout.write(json.dumps((latencies, physical)))
@@ -0,0 +1,109 @@
+import io
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from api.management.commands.benchmark_api import DATASETS, load_dataset
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from core import benchmark
+
+User = get_user_model()
+
+# Сравниваемые варианты: значения настройки API_JSON.
+BACKENDS = {
+    'json': (JSONRenderer, JSONParser),
+    'orjson': (ORJSONRenderer, ORJSONParser),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендерер и парсер JSON из DRF с вариантами на orjson '
+        'на ответе эндпоинта: запись ответа, разбор тела и запрос '
+        'целиком. Данные создаются во временной тестовой базе, ответы '
+        'обоих вариантов должны совпадать побайтно (различие бывает '
+        'в записи чисел с плавающей точкой с экспонентой, в ответах API '
+        'их быть не должно).'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--path', default='/api/recipes/?limit=100')
+        parser.add_argument('--size', choices=DATASETS, default='small')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options) -> None:
+        repeat = max(options['repeat'], 1)
+        results = {}
+        contents = {}
+        with benchmark.test_database():
+            load_dataset(options['size'], options['seed'])
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION=(
+                    'Token '
+                    + Token.objects.get_or_create(
+                        user=User.objects.order_by('id').first(),
+                    )[0].key
+                ),
+            )
+            for backend, (renderer_class, parser_class) in BACKENDS.items():
+                with mock.patch.object(
+                    APIView,
+                    'renderer_classes',
+                    [renderer_class],
+                ):
+                    response = client.get(options['path'])
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{options["path"]}: {response.status_code}',
+                        )
+                    contents[backend] = response.content
+                    renderer, parser = renderer_class(), parser_class()
+                    results[backend] = {
+                        'render': benchmark.measure(
+                            lambda: renderer.render(response.data),
+                            repeat,
+                        ),
+                        'parse': benchmark.measure(
+                            lambda: parser.parse(
+                                io.BytesIO(response.content),
+                            ),
+                            repeat,
+                        ),
+                        'request': benchmark.measure(
+                            lambda: client.get(options['path']),
+                            repeat,
+                        ),
+                    }
+        if len(set(contents.values())) > 1:
+            raise CommandError(
+                'Ответы рендереров различаются (например, в ответе есть '
+                'число с плавающей точкой с экспонентой).',
+            )
+
+        self.stdout.write(
+            f'{options["path"]}: {len(contents["json"]) / 1024:.1f} КБ',
+        )
+        self.stdout.write(
+            f'{"замер":<10}{"json, мс":>12}{"orjson, мс":>12}'
+            f'{"ускорение":>12}',
+        )
+        for name in results['json']:
+            before = results['json'][name]['median_ms']
+            after = results['orjson'][name]['median_ms']
+            self.stdout.write(
+                f'{name:<10}{before:>12.3f}{after:>12.3f}'
+                f'{before / after:>11.1f}x',
+            )
+        if options['output']:
+            benchmark.save(results, Path(options['output']))
@@ -0,0 +1,200 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.budgets import QUERY_BUDGETS, QueryBudget
+from core import benchmark
+from core.queries import repeated
+from recipes.models import (
+    AmountIngredient,
+    Cart,
+    CartTotal,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+# Тестовые данные: у каждого автора несколько рецептов, пользователь
+# подписан на всех авторов, поэтому страницы заполнены при любом `limit`.
+AUTHORS = 70
+RECIPES_PER_AUTHOR = 12
+INGREDIENTS_PER_RECIPE = 4
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет, что число SQL-запросов эндпоинтов API не зависит '
+        'от размера страницы и укладывается в бюджеты из api/budgets.py. '
+        'Данные создаются во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Проверить только указанные эндпоинты.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        budgets = [
+            budget
+            for budget in QUERY_BUDGETS
+            if not options['names'] or budget.name in options['names']
+        ]
+        failures = 0
+        with benchmark.test_database():
+            self._create_data()
+            for budget in budgets:
+                failures += not self._check(budget)
+        if failures:
+            raise CommandError(f'Бюджет запросов превышен: {failures}')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
+
+    def _create_data(self) -> None:
+        call_command('flush', interactive=False, verbosity=0)
+        call_command('seed_units', verbosity=0, stdout=io.StringIO())
+        call_command('load_ingredients', verbosity=0, stdout=io.StringIO())
+        self.user = User.objects.create_user(
+            username='budget',
+            email='budget@example.com',
+            first_name='Бюджет',
+            last_name='Запросов',
+        )
+        authors = User.objects.bulk_create(
+            User(
+                username=f'author_{num}',
+                email=f'author_{num}@example.com',
+                first_name='Автор',
+                last_name=str(num),
+            )
+            for num in range(AUTHORS)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'тег {num}', color=f'#00000{num}', slug=f'tag_{num}')
+            for num in range(3)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {num}',
+                author=author,
+                text='Описание',
+                cooking_time=10,
+                image='recipe.png',
+            )
+            for author in authors
+            for num in range(RECIPES_PER_AUTHOR)
+        )
+        ingredients = list(Ingredient.objects.order_by('id')[:50])
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe,
+                ingredients=ingredients[(num + shift) % len(ingredients)],
+                amount=100,
+            )
+            for num, recipe in enumerate(recipes)
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[num % len(tags)])
+            for num, recipe in enumerate(recipes)
+        )
+        Subscriptions.objects.bulk_create(
+            Subscriptions(user=self.user, author=author) for author in authors
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=self.user, recipe=recipe) for recipe in recipes[::3]
+        )
+        Cart.objects.bulk_create(
+            Cart(user=self.user, recipe=recipe) for recipe in recipes[:20]
+        )
+        CartTotal.objects.rebuild((self.user.id,))
+
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}',
+        )
+        # Снимок пользователя попадает в кеш токенов до замеров.
+        self.client.get('/api/users/me/')
+        self.anonymous = APIClient()
+        self.ingredients = [ingredient.id for ingredient in ingredients]
+        self.tags = [tag.id for tag in tags]
+        self.recipes = [recipe.id for recipe in recipes]
+        self.placeholders = {
+            'recipe': recipes[0].id,
+            'user': authors[0].id,
+        }
+
+    def _check(self, budget: QueryBudget) -> bool:
+        """Вызывает эндпоинт для всех размеров и сверяет число запросов."""
+        counts = {}
+        for size in budget.sizes:
+            with benchmark.capture_queries() as captured:
+                self._request(budget, size)
+            counts[size] = len(captured)
+        constant = len(set(counts.values())) == 1
+        within = max(counts.values()) <= budget.budget
+        sizes = ', '.join(f'{size}: {count}' for size, count in counts.items())
+        line = f'{budget.name}: {sizes} (бюджет {budget.budget})'
+        if constant and within:
+            self.stdout.write(line)
+            return True
+
+        reason = 'превышен бюджет' if constant else 'зависит от размера'
+        self.stdout.write(self.style.ERROR(f'{line} - {reason}'))
+        for shape, count, sql in repeated(captured):
+            self.stdout.write(f'    {count} x {shape}')
+            self.stdout.write(f'      пример: {sql}')
+        return False
+
+    def _request(self, budget: QueryBudget, size: int) -> None:
+        client = self.client if budget.authenticated else self.anonymous
+        placeholders = {
+            'size': size,
+            'ids': ','.join(map(str, self.recipes[:size])),
+            **self.placeholders,
+        }
+        path = budget.path.format(**placeholders)
+        data = None
+        if budget.batch:
+            data = {
+                'requests': [
+                    {'path': sub_path.format(**placeholders)}
+                    for sub_path in budget.batch
+                ],
+            }
+        elif budget.method == 'post':
+            data = {
+                'name': f'Новый рецепт {size}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': benchmark.image_base64(),
+                'tags': self.tags[:2],
+                'ingredients': [
+                    {'id': pk, 'amount': 10} for pk in self.ingredients[:size]
+                ],
+            }
+        if budget.method == 'get':
+            response = client.get(path)
+        else:
+            # Изменения откатываются, чтобы проверки не влияли друг
+            # на друга.
+            with transaction.atomic():
+                response = getattr(client, budget.method)(
+                    path,
+                    data,
+                    format='json',
+                )
+                transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{budget.name}: {budget.method.upper()} {path} вернул '
+                f'{response.status_code} {response.content[:200]!r}',
+            )
@@ -0,0 +1,149 @@
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    level: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Строки вывода `python -X importtime`.
+
+    Формат строки: `import time: <своё> | <с вложенными> | <модуль>`,
+    время в микросекундах, вложенность - отступ имени по два пробела.
+
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:') :].split('|')
+        if not own.strip().isdigit():
+            continue
+        module = name.rstrip()
+        records.append(
+            ImportRecord(
+                module.strip(),
+                (len(module) - len(module.lstrip()) - 1) // 2,
+                int(own),
+                int(cumulative),
+            ),
+        )
+    return records
+
+
+class Command(BaseCommand):
+    help = (
+        'Время запуска команды manage.py: медиана полного времени '
+        'процесса и разбор импортов по `python -X importtime` - '
+        'пакеты и модули, импорт которых дольше всего.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--command',
+            default='version',
+            help='Замеряемая команда с аргументами, по умолчанию - только '
+            'запуск Django.',
+        )
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options) -> None:
+        command = (
+            sys.executable,
+            'manage.py',
+            *shlex.split(options['command']),
+        )
+        env = dict(os.environ)
+        if not options['settings']:
+            # Настройки выбирает manage.py замеряемой команды, как при
+            # обычном запуске (см. LEAN_COMMANDS).
+            env.pop('DJANGO_SETTINGS_MODULE', None)
+
+        durations = []
+        for _ in range(max(options['runs'], 1)):
+            started = time.perf_counter()
+            self._run(command, env)
+            durations.append(time.perf_counter() - started)
+        records = parse_importtime(
+            self._run((command[0], '-X', 'importtime', *command[1:]), env),
+        )
+
+        packages = defaultdict(int)
+        for record in records:
+            packages[record.module.partition('.')[0]] += record.self_us
+        report = {
+            'command': options['command'],
+            'wall_ms': round(statistics.median(durations) * 1000, 1),
+            'imports_ms': round(
+                sum(record.self_us for record in records) / 1000,
+                1,
+            ),
+            'modules': len(records),
+            'packages': {
+                name: round(total / 1000, 1)
+                for name, total in sorted(
+                    packages.items(),
+                    key=lambda item: item[1],
+                    reverse=True,
+                )[: options['limit']]
+            },
+            'top_level': {
+                record.module: round(record.cumulative_us / 1000, 1)
+                for record in sorted(
+                    (record for record in records if record.level == 0),
+                    key=lambda record: record.cumulative_us,
+                    reverse=True,
+                )[: options['limit']]
+            },
+        }
+        self._print(report)
+        if options['output']:
+            benchmark.save(report, Path(options['output']))
+
+    @staticmethod
+    def _run(command: tuple, env: dict) -> str:
+        """Запускает команду и возвращает её stderr."""
+        process = subprocess.run(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        return process.stderr
+
+    def _print(self, report: dict) -> None:
+        self.stdout.write(
+            f'manage.py {report["command"]}: {report["wall_ms"]} мс '
+            f'(медиана), импорт {report["modules"]} модулей - '
+            f'{report["imports_ms"]} мс',
+        )
+        self.stdout.write(f'\n{"пакет":<40}{"своё время, мс":>16}')
+        for name, total in report['packages'].items():
+            self.stdout.write(f'{name:<40}{total:>16.1f}')
+        self.stdout.write(
+            f'\n{"импорт верхнего уровня":<40}{"с вложенными, мс":>16}',
+        )
+        for name, total in report['top_level'].items():
+            self.stdout.write(f'{name:<40}{total:>16.1f}')
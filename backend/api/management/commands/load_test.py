@@ -0,0 +1,460 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from core import benchmark
+from recipes.models import Cart, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Доля сценариев в нагрузке: имя сценария - вес.
+TRAFFIC_MIX = {
+    'browse': 40,
+    'retrieve': 20,
+    'filter_tags': 15,
+    'toggle_favorite': 10,
+    'search_ingredients': 5,
+    'download_cart': 5,
+    'create_recipe': 5,
+}
+# Размер корзины каждого нагрузочного пользователя.
+CART_SIZE = 5
+
+
+class LoadRunner:
+    """Выполняет сценарии в несколько потоков и копит задержки.
+
+    Каждый поток держит свою HTTP-сессию и свой генератор случайных
+    чисел, поэтому набор запросов определяется `seed`.
+
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        tokens: list[str],
+        recipes: list[int],
+        tags: list[tuple[int, str]],
+        ingredients: list[int],
+        seed: int,
+    ) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+        self.recipes = recipes
+        self.tags = tags
+        self.ingredients = ingredients
+        self.seed = seed
+        self.image = benchmark.image_base64()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def run(self, concurrency: int, duration: float) -> float:
+        """Нагружает сервер `duration` секунд, возвращает фактическое время."""
+        started = time.perf_counter()
+        deadline = started + duration
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [
+                executor.submit(self._worker, num, deadline)
+                for num in range(concurrency)
+            ]:
+                future.result()
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        """Пропускная способность, перцентили и доля ошибок по эндпоинтам."""
+        result = {}
+        for endpoint in sorted(self.latencies):
+            values = self.latencies[endpoint]
+            result[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors[endpoint],
+                'error_rate': round(self.errors[endpoint] / len(values), 4),
+                'rps': round(len(values) / elapsed, 2),
+                **benchmark.percentiles(values),
+            }
+        total = [
+            value for values in self.latencies.values() for value in values
+        ]
+        errors = sum(self.errors.values())
+        result['total'] = {
+            'requests': len(total),
+            'errors': errors,
+            'error_rate': round(errors / max(len(total), 1), 4),
+            'rps': round(len(total) / elapsed, 2),
+            **benchmark.percentiles(total),
+        }
+        return result
+
+    def _worker(self, num: int, deadline: float) -> None:
+        rng = random.Random(self.seed + num)
+        session = requests.Session()
+        token = self.tokens[num % len(self.tokens)]
+        auth = {'Authorization': f'Token {token}'}
+        names = list(TRAFFIC_MIX)
+        weights = list(TRAFFIC_MIX.values())
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights=weights)[0]
+            getattr(self, f'_{scenario}')(session, rng, auth)
+
+    def _send(
+        self,
+        session: requests.Session,
+        endpoint: str,
+        method: str,
+        path: str,
+        expected: tuple[int, ...] = (200,),
+        **kwargs,
+    ) -> requests.Response | None:
+        """Отправляет запрос и записывает задержку под именем `endpoint`."""
+        response = None
+        started = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, **kwargs)
+            failed = response.status_code not in expected
+        except requests.RequestException:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.errors[endpoint] += failed
+        return response
+
+    def _browse(self, session, rng, auth) -> None:
+        page = rng.randint(1, max(len(self.recipes) // 6, 1))
+        self._send(
+            session,
+            'recipes_list',
+            'GET',
+            f'/api/recipes/?page={page}&limit=6',
+        )
+
+    def _retrieve(self, session, rng, auth) -> None:
+        self._send(
+            session,
+            'recipe_retrieve',
+            'GET',
+            f'/api/recipes/{rng.choice(self.recipes)}/',
+        )
+
+    def _filter_tags(self, session, rng, auth) -> None:
+        query = '&'.join(
+            f'tags={slug}'
+            for _, slug in rng.sample(self.tags, k=min(2, len(self.tags)))
+        )
+        self._send(
+            session,
+            'recipes_by_tags',
+            'GET',
+            f'/api/recipes/?limit=6&{query}',
+        )
+
+    def _toggle_favorite(self, session, rng, auth) -> None:
+        path = f'/api/recipes/{rng.choice(self.recipes)}/favorite/'
+        response = self._send(
+            session,
+            'favorite_add',
+            'POST',
+            path,
+            (201, 400),
+            headers=auth,
+        )
+        if response is not None and response.status_code == 201:
+            self._send(
+                session,
+                'favorite_remove',
+                'DELETE',
+                path,
+                (204,),
+                headers=auth,
+            )
+
+    def _search_ingredients(self, session, rng, auth) -> None:
+        self._send(
+            session,
+            'ingredients_search',
+            'GET',
+            f'/api/ingredients/?name={rng.choice("абвгдеклмнопрст")}',
+        )
+
+    def _download_cart(self, session, rng, auth) -> None:
+        self._send(
+            session,
+            'download_shopping_cart',
+            'GET',
+            '/api/recipes/download_shopping_cart/',
+            headers=auth,
+        )
+
+    def _create_recipe(self, session, rng, auth) -> None:
+        self._send(
+            session,
+            'recipe_create',
+            'POST',
+            '/api/recipes/',
+            (201,),
+            headers=auth,
+            json={
+                'name': f'Нагрузка {rng.getrandbits(48):x}',
+                'text': 'Рецепт создан нагрузочным тестом.',
+                'cooking_time': rng.randint(5, 120),
+                'image': self.image,
+                'tags': [rng.choice(self.tags)[0]],
+                'ingredients': [
+                    {'id': pk, 'amount': rng.randint(1, 500)}
+                    for pk in rng.sample(
+                        self.ingredients,
+                        k=min(rng.randint(2, 8), len(self.ingredients)),
+                    )
+                ],
+            },
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API: запускает gunicorn с настройками '
+        'gunicorn.conf.py (или использует --url) и воспроизводит '
+        'смешанный трафик. '
+        'Выводит пропускную способность, p50/p95/p99 и долю ошибок.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--url',
+            help='Адрес уже запущенного сервера. Без него запускается gunicorn.',
+        )
+        parser.add_argument('--bind', default='127.0.0.1:8765')
+        parser.add_argument(
+            '--worker-class',
+            help='Класс воркеров gunicorn: sync, gthread или uvicorn.',
+        )
+        parser.add_argument(
+            '--asgi',
+            action='store_true',
+            help='Запустить backend.asgi с воркерами uvicorn.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Количество воркеров gunicorn (по умолчанию - по CPU).',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='Количество потоков воркера gthread.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Количество одновременных клиентов.',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность нагрузки в секундах.',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Количество нагрузочных пользователей.',
+        )
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Удалить нагрузочных пользователей и их рецепты после теста.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        recipes = list(
+            Recipe.objects.exclude(
+                author__username__startswith=options['prefix'],
+            ).values_list('id', flat=True),
+        )
+        tags = list(Tag.objects.values_list('id', 'slug'))
+        if not recipes or not tags:
+            raise CommandError(
+                'В базе нет рецептов или тегов, выполните generate_fake_data.',
+            )
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tokens = self._prepare_users(
+            options['users'],
+            options['prefix'],
+            recipes,
+            random.Random(options['seed']),
+        )
+
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            base_url = f'http://{options["bind"]}'
+            worker_class = options['worker_class']
+            if options['asgi'] or worker_class == 'uvicorn':
+                worker_class = 'uvicorn.workers.UvicornWorker'
+            server = self._start_server(
+                options['bind'],
+                base_url,
+                {
+                    'GUNICORN_WORKER_CLASS': worker_class,
+                    'GUNICORN_WORKERS': options['workers'],
+                    'GUNICORN_THREADS': options['threads'],
+                    # manage.py выключает прогрев, серверу он нужен.
+                    'WARMUP': '1',
+                },
+            )
+        runner = LoadRunner(
+            base_url,
+            tokens,
+            recipes,
+            tags,
+            ingredients,
+            options['seed'],
+        )
+        try:
+            elapsed = runner.run(
+                max(options['concurrency'], 1),
+                options['duration'],
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if options['cleanup']:
+                self._cleanup(options['prefix'])
+
+        report = runner.report(elapsed)
+        self._print(report)
+        if options['output']:
+            benchmark.save(
+                {
+                    'options': {
+                        key: options[key]
+                        for key in (
+                            'worker_class',
+                            'workers',
+                            'threads',
+                            'concurrency',
+                            'duration',
+                            'asgi',
+                        )
+                    },
+                    'endpoints': report,
+                },
+                Path(options['output']),
+            )
+
+    def _prepare_users(
+        self,
+        count: int,
+        prefix: str,
+        recipes: list[int],
+        rng: random.Random,
+    ) -> list[str]:
+        """Создаёт нагрузочных пользователей с токенами и корзинами."""
+        password = make_password(None)
+        tokens = []
+        for num in range(max(count, 1)):
+            user, created = User.objects.get_or_create(
+                username=f'{prefix}_{num}',
+                defaults={
+                    'email': f'{prefix}_{num}@example.com',
+                    'first_name': 'Нагрузка',
+                    'last_name': str(num),
+                    'password': password,
+                },
+            )
+            if created:
+                cart = rng.sample(recipes, k=min(CART_SIZE, len(recipes)))
+                for recipe in cart:
+                    Cart.objects.create(user=user, recipe_id=recipe)
+            tokens.append(Token.objects.get_or_create(user=user)[0].key)
+        return tokens
+
+    def _cleanup(self, prefix: str) -> None:
+        """Удаляет нагрузочных пользователей вместе с их рецептами.
+
+        При удалении автора рецепты остаются без автора, поэтому
+        они удаляются явно. В корзины они не попадают, пересчитывать
+        итоги корзин не нужно.
+
+        """
+        users = User.objects.filter(username__startswith=prefix)
+        Recipe.objects.filter(author__in=users).delete()
+        users.delete()
+
+    def _start_server(
+        self,
+        bind: str,
+        base_url: str,
+        config: dict,
+    ) -> subprocess.Popen:
+        """Запускает gunicorn и ждёт, пока он начнёт отвечать.
+
+        Args:
+            config: Переменные окружения для gunicorn.conf.py, `None`
+                оставляет значение по умолчанию.
+
+        """
+        server = subprocess.Popen(
+            (
+                sys.executable,
+                '-m',
+                'gunicorn',
+                '--bind',
+                bind,
+                '--log-level',
+                'warning',
+            ),
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                **{
+                    name: str(value)
+                    for name, value in config.items()
+                    if value is not None
+                },
+            },
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn завершился при запуске.')
+            try:
+                requests.get(f'{base_url}/api/tags/', timeout=1)
+            except requests.RequestException:
+                time.sleep(0.2)
+                continue
+            return server
+        server.terminate()
+        raise CommandError('gunicorn не ответил за 30 секунд.')
+
+    def _print(self, report: dict) -> None:
+        self.stdout.write(
+            f'{"эндпоинт":<24}{"запросов":>9}{"ошибок":>8}{"rps":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}',
+        )
+        for endpoint, row in report.items():
+            self.stdout.write(
+                f'{endpoint:<24}{row["requests"]:>9}'
+                f'{row["error_rate"]:>8.1%}{row["rps"]:>9.1f}'
+                f'{row["p50"]:>10.1f}{row["p95"]:>10.1f}{row["p99"]:>10.1f}',
+            )
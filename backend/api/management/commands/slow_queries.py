@@ -0,0 +1,88 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Таблицы, которые план читает полным перебором."""
+    tables = []
+    if plan.get('Node Type') == 'Seq Scan':
+        tables.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', ()):
+        tables.extend(seq_scans(child))
+    return tables
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных SQL-запросов (SLOW_QUERY_LOG): '
+        'запросы одной формы, отсортированные по суммарному времени.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--log',
+            default=settings.SLOW_QUERY_LOG,
+            help='Файл журнала, ротированные копии читаются тоже.',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--view',
+            help='Только запросы указанного представления.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        log = Path(options['log'])
+        files = sorted(log.parent.glob(f'{log.name}*'))
+        if not files:
+            raise CommandError(f'Журнал {log} не найден.')
+
+        groups = defaultdict(
+            lambda: {'count': 0, 'total': 0, 'max': 0, 'views': set()},
+        )
+        for path in files:
+            with path.open(encoding='utf8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if options['view'] and record['view'] != options['view']:
+                        continue
+                    group = groups[record['fingerprint']]
+                    group['count'] += 1
+                    group['total'] += record['duration_ms']
+                    group['max'] = max(group['max'], record['duration_ms'])
+                    view = str(record['view'])
+                    if record['action']:
+                        view = f'{view} ({record["action"]})'
+                    group['views'].add(view)
+                    if isinstance(record.get('explain'), list):
+                        group['plan'] = record['explain'][0]['Plan']
+
+        top = sorted(
+            groups.items(),
+            key=lambda item: item[1]['total'],
+            reverse=True,
+        )[: options['limit']]
+        for shape, group in top:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{group["total"]:.1f} мс всего, {group["count"]} раз, '
+                    f'среднее {group["total"] / group["count"]:.1f} мс, '
+                    f'максимум {group["max"]:.1f} мс',
+                ),
+            )
+            self.stdout.write(f'  {shape}')
+            views = ', '.join(sorted(group['views']))
+            self.stdout.write(f'  представления: {views}')
+            if 'plan' in group:
+                plan = group['plan']
+                scans = ', '.join(seq_scans(plan)) or 'нет'
+                self.stdout.write(
+                    f'  план: {plan["Node Type"]}, стоимость '
+                    f'{plan["Total Cost"]}, полный перебор: {scans}',
+                )
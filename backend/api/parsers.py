@@ -0,0 +1,56 @@
+"""Парсер JSON на orjson.
+
+Тело в UTF-8 разбирается orjson. Если orjson его не принял (ошибка
+в JSON, числа вне диапазона double), тело разбирает парсер DRF: он же
+формирует текст ошибки. Целые вне диапазона от -2**63 до 2**64 - 1
+orjson читает как float, а такое число может иметь уже 19 цифр
+(-9223372036854775809), поэтому тела с 19 и более цифрами подряд тоже
+разбирает парсер DRF. Целые до 18 цифр orjson читает точно.
+Без пакета orjson, для других кодировок и без `strict` работает
+парсер DRF.
+"""
+
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Цифры -> `0`, остальное -> пробел: длинное число ищется как подстрока,
+# это быстрее регулярного выражения.
+DIGITS = bytes(
+    ord('0') if ord('0') <= code <= ord('9') else ord(' ')
+    for code in range(256)
+)
+LONG_NUMBER = b'0' * 19
+
+
+class ORJSONParser(JSONParser):
+    def parse(
+        self,
+        stream,
+        media_type: str | None = None,
+        parser_context: dict | None = None,
+    ):
+        encoding = (parser_context or {}).get(
+            'encoding',
+            settings.DEFAULT_CHARSET,
+        )
+        if (
+            orjson is None
+            or not self.strict
+            or codecs.lookup(encoding).name != 'utf-8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_NUMBER not in body.translate(DIGITS):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
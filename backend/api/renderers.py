@@ -0,0 +1,58 @@
+"""Рендерер JSON на orjson.
+
+Вывод совпадает с `JSONRenderer` DRF при настройках по умолчанию:
+компактные разделители, кириллица без `\\u`-экранирования, U+2028 и
+U+2029 экранируются. Не совпадает запись чисел с плавающей точкой,
+которые Python пишет с экспонентой (меньше 1e-4 и от 1e16 по модулю):
+`1e-7` вместо `1e-07`, `0.00001` вместо `1e-05`, `1e16` вместо `1e+16` -
+значения те же, но байты другие. В ответах API чисел с плавающей точкой
+нет (`Decimal` отдаётся строкой); ответ эндпоинта побайтно сверяет
+`benchmark_json`. NaN orjson пишет как `null`, DRF отвечает ошибкой.
+Без пакета orjson, с отступами (`?format=api`, `Accept: ...; indent=4`)
+и для данных, которые orjson не умеет записать (целые больше 64 бит),
+работает рендерер DRF.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Даты и время записывает кодировщик DRF (`default`): миллисекунды
+    # и `Z` вместо `+00:00`, как у стандартного рендерера.
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(
+        self,
+        data,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=self.options,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9',
+            b'\\u2029',
+        )
@@ -1,18 +1,29 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F
+from django.db import transaction
+from django.http import Http404
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ModelSerializer
 
-from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+from core.classes import SparseFieldsMixin
+from core.constants import Limits
+from core.tracing import traced
+from recipes.models import (
+    AmountIngredient,
+    CartTotal,
+    Ingredient,
+    Recipe,
+    Tag,
+)
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для использования с моделью User."""
 
     is_subscribed = SerializerMethodField()
@@ -30,6 +41,7 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
         read_only_fields = ('is_subscribed',)
 
+    @traced
     def get_is_subscribed(self, obj: User) -> bool:
         """Проверка подписки пользователей.
 
@@ -51,7 +63,13 @@ class UserSerializer(serializers.ModelSerializer):
         if user.is_anonymous or (user == obj):
             return False
 
-        return user.subscriptions.filter(author=obj).exists()
+        # Подписки загружаются одним запросом на весь ответ: контекст
+        # общий для всех вложенных сериализаторов.
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                user.subscriptions.values_list('author_id', flat=True),
+            )
+        return obj.id in self.context['subscribed_ids']
 
     def create(self, validated_data: dict) -> User:
         """Создаёт нового пользователя с запрошенными полями.
@@ -94,12 +112,14 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class IngredientSerializer(serializers.ModelSerializer):
+    measurement_unit = serializers.CharField(source='unit.name')
+
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeReadSerializer(ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
@@ -122,29 +142,83 @@ class RecipeReadSerializer(ModelSerializer):
             'cooking_time',
         )
 
+    @traced
     def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredientrecipes__amount'),
-        )
-        return ingredients
+        return [
+            {
+                'id': amount.ingredients.id,
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.unit.name,
+                'amount': amount.amount,
+            }
+            for amount in sorted(
+                obj.ingredientrecipes.all(),
+                key=lambda amount: amount.ingredients.name,
+            )
+        ]
 
+    @traced
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites.filter(recipe=obj).exists()
 
+    @traced
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.shopping_cart.filter(recipe=obj).exists()
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    """Список `id` рецептов для пакетного получения.
+
+    Повторы убираются, порядок первого вхождения сохраняется.
+
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=Limits.RECIPES_BATCH_SIZE,
+    )
+
+    def validate_ids(self, ids: list[int]) -> list[int]:
+        return list(dict.fromkeys(ids))
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Запрос к API в составе пакета (`BatchView`)."""
+
+    method = serializers.ChoiceField(choices=SAFE_METHODS, default='GET')
+    path = serializers.RegexField(r'^/', max_length=2048)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет запросов к API: не больше `BATCH_MAX_REQUESTS` запросов."""
+
+    requests = serializers.ListField(
+        child=SubRequestSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
+    concurrent = serializers.BooleanField(default=False)
+
+
+class CartTotalSerializer(serializers.Serializer):
+    """Строка списка покупок, просуммированная по единицам измерения."""
+
+    name = serializers.CharField()
+    amount = serializers.ReadOnlyField()
+    measurement_unit = serializers.CharField()
+
+
 class AmountIngredientWriteSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(write_only=True)
 
@@ -182,10 +256,16 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     'ingredients': 'Нужен хотя бы один ингредиент!',
                 },
             )
+        existing = set(
+            Ingredient.objects.filter(
+                id__in=[item['id'] for item in ingredients],
+            ).values_list('id', flat=True),
+        )
         ingredients_list = []
         for item in ingredients:
-            ingredient = get_object_or_404(Ingredient, id=item['id'])
-            if ingredient in ingredients_list:
+            if item['id'] not in existing:
+                raise Http404('Ингредиент не найден.')
+            if item['id'] in ingredients_list:
                 raise ValidationError(
                     {'ingredients': 'ингредиенты не могут повторяться!'},
                 )
@@ -195,7 +275,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                         'amount': 'Количество ингредиента должно быть больше 0!',
                     },
                 )
-            ingredients_list.append(ingredient)
+            ingredients_list.append(item['id'])
         return ingredients
 
     def validate_tags(self, tags):
@@ -216,7 +296,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         AmountIngredient.objects.bulk_create(
             [
                 AmountIngredient(
-                    ingredients=Ingredient.objects.get(id=ingredient['id']),
+                    ingredients_id=ingredient['id'],
                     recipe=recipe,
                     amount=ingredient['amount'],
                 )
@@ -224,6 +304,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ],
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -232,22 +313,31 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self.create_ingredients_amounts(recipe=recipe, ingredients=ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         instance = super().update(instance, validated_data)
         instance.tags.clear()
         instance.tags.set(tags)
+        cart_users = list(
+            instance.shopping_cart.values_list('user_id', flat=True),
+        )
+        CartTotal.objects.apply_recipe(instance, cart_users, sign=-1)
         instance.ingredients.clear()
         self.create_ingredients_amounts(
             recipe=instance,
             ingredients=ingredients,
         )
+        CartTotal.objects.apply_recipe(instance, cart_users)
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.with_details(request.user).get(
+            pk=instance.pk,
+        )
         return RecipeReadSerializer(instance, context=context).data
 
 
@@ -297,13 +387,19 @@ class UserSubscribeSerializer(UserSerializer):
         )
         read_only_fields = ('__all__',)
 
+    @traced
     def get_recipes_count(self, obj: User) -> int:
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
+    @traced
     def get_recipes(self, obj):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
+        recipes = getattr(obj, 'recipes_page', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
         if limit:
             recipes = recipes[: int(limit)]
         serializer = SmallRecipeSerializer(recipes, many=True, read_only=True)
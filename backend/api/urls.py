@@ -1,7 +1,14 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.views import (
+    BatchView,
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    UserViewSet,
+)
 
 app_name = 'api'
 
@@ -11,7 +18,61 @@ router.register('ingredients', IngredientViewSet, 'ingredients')
 router.register('recipes', RecipeViewSet, 'recipes')
 router.register('users', UserViewSet, 'users')
 
+# Представления роутера по имени маршрута: их вызывают пакетные запросы
+# и на них передаются запросы, которые не обрабатывают async_views.
+drf_views = {pattern.name: pattern.callback for pattern in router.urls}
+
 urlpatterns = (
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('batch/', BatchView.as_view(views=drf_views), name='batch'),
 )
+
+if settings.ASYNC_READ_VIEWS:
+    from api import async_views
+
+    urlpatterns = (
+        re_path(
+            r'^recipes/$',
+            async_views.read_view(
+                async_views.recipe_list,
+                drf_views['recipes-list'],
+            ),
+            name='recipes-list',
+        ),
+        re_path(
+            # Только числа: остальное - действия вроде
+            # download_shopping_cart, они остаются у роутера.
+            r'^recipes/(?P<pk>[0-9]+)/$',
+            async_views.read_view(
+                async_views.recipe_detail,
+                drf_views['recipes-detail'],
+            ),
+            name='recipes-detail',
+        ),
+        re_path(
+            r'^tags/$',
+            async_views.read_view(
+                async_views.tag_list,
+                drf_views['tags-list'],
+            ),
+            name='tags-list',
+        ),
+        re_path(
+            r'^ingredients/$',
+            async_views.read_view(
+                async_views.ingredient_list,
+                drf_views['ingredients-list'],
+            ),
+            name='ingredients-list',
+        ),
+        re_path(
+            r'^users/subscriptions/$',
+            async_views.read_view(
+                async_views.subscriptions,
+                drf_views['users-subscriptions'],
+            ),
+            name='users-subscriptions',
+        ),
+        *urlpatterns,
+    )
@@ -1,22 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Iterable
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F, Q, QuerySet, Sum
-from django.http import HttpRequest
+from django.db import connections
+from django.db.models import Count, Prefetch, Q, QuerySet
+from django.http import HttpRequest, QueryDict
 from django.http.response import HttpResponse
+from django.urls import Resolver404, resolve
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import status
+from rest_framework import exceptions, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from api.filters import IngredientFilterBackend, RecipeFilter
 from api.pagination import CustomPagination
 from api.permissions import AdminOrReadOnly, AuthorOrReadOnly
 from api.serializers import (
+    BatchSerializer,
+    CartTotalSerializer,
     IngredientSerializer,
+    RecipeBatchSerializer,
     RecipeReadSerializer,
     RecipeWriteSerializer,
     SmallRecipeSerializer,
@@ -24,15 +37,160 @@ from api.serializers import (
     UserSubscribeSerializer,
 )
 from backend.settings import DATE_TIME_FORMAT
-from core.classes import AddDelView
+from core.classes import (
+    AddDelView,
+    PhaseTimingMixin,
+    SparseFieldsViewMixin,
+    TracingMixin,
+)
 from core.constants import Additional, Methods
-from recipes.models import Cart, Favorite, Ingredient, Recipe, Tag
+from core.timing import timed_serializer
+from recipes.models import (
+    Cart,
+    CartTotal,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+)
 from users.models import Subscriptions
 
 User = get_user_model()
 
 
-class RecipeViewSet(ModelViewSet, AddDelView):
+def filter_recipes(
+    queryset: QuerySet[Recipe],
+    user: User,
+    params: QueryDict,
+    fields: frozenset[str] | None = None,
+) -> QuerySet[Recipe]:
+    """Рецепты для пользователя с фильтрами из параметров запроса.
+
+    Args:
+        queryset: Исходная выборка рецептов.
+        user: Пользователь, сделавший запрос.
+        params: Параметры `author`, `is_in_shopping_cart`, `is_favorited`.
+        fields: Выводимые поля (`?fields=`/`?omit=`), `None` - все.
+
+    Returns:
+        `QuerySet`: Рецепты с данными для `RecipeReadSerializer`.
+
+    """
+    queryset = queryset.with_details(user, fields)
+
+    author = params.get('author')
+    if author:
+        queryset = queryset.filter(author=author)
+    if user.is_anonymous:
+        return queryset
+
+    is_in_cart = params.get('is_in_shopping_cart')
+
+    if is_in_cart in Additional.SYMBOL_TRUE_SEARCH:
+        queryset = queryset.filter(shopping_cart__user=user)
+    elif is_in_cart in Additional.SYMBOL_FALSE_SEARCH:
+        queryset = queryset.exclude(shopping_cart__user=user)
+    is_favorite = params.get('is_favorited')
+    if is_favorite in Additional.SYMBOL_TRUE_SEARCH:
+        queryset = queryset.filter(in_favorites__user=user)
+    if is_favorite in Additional.SYMBOL_FALSE_SEARCH:
+        queryset = queryset.exclude(in_favorites__user=user)
+    return queryset
+
+
+def subscriptions_queryset(
+    user: User,
+    limit: str | None,
+    fields: frozenset[str] | None = None,
+) -> QuerySet[User]:
+    """Авторы, на которых подписан пользователь, с первыми рецептами.
+
+    Args:
+        user: Подписчик.
+        limit: Сколько рецептов каждого автора загрузить (`recipes_limit`).
+        fields: Выводимые поля (`?fields=`/`?omit=`), `None` - все.
+
+    Returns:
+        `QuerySet`: Авторы для `UserSubscribeSerializer`.
+
+    """
+    queryset = User.objects.filter(subscribers__user=user).order_by(
+        'username',
+    )
+    if fields is not None:
+        queryset = only_columns(queryset, fields)
+    if fields is None or 'recipes_count' in fields:
+        queryset = queryset.annotate(recipes_count=Count('recipes'))
+    if fields is None or 'recipes' in fields:
+        recipes = Recipe.objects.all()
+        if limit and limit.isdigit():
+            recipes = recipes[: int(limit)]
+        queryset = queryset.prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_page'),
+        )
+    return queryset
+
+
+def only_columns(queryset: QuerySet, fields: frozenset[str]) -> QuerySet:
+    """Выборка только столбцов из `fields` и первичного ключа."""
+    return queryset.only(
+        *(
+            field.name
+            for field in queryset.model._meta.concrete_fields
+            if field.primary_key or field.name in fields
+        ),
+    )
+
+
+def batch_ids(data: dict | QueryDict) -> list[int]:
+    """Проверенный список `id` рецептов пакетного запроса.
+
+    Args:
+        data: Тело запроса `{"ids": [...]}` или параметры запроса,
+            где `ids` - числа через запятую.
+
+    Returns:
+        list[int]: `id` без повторов в порядке запроса.
+
+    Raises:
+        ValidationError: Пустой, слишком длинный или неверный список.
+
+    """
+    if isinstance(data, QueryDict):
+        data = {
+            'ids': [
+                item
+                for value in data.getlist('ids')
+                for item in value.split(',')
+                if item.strip()
+            ],
+        }
+    serializer = RecipeBatchSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def order_by_ids(recipes: Iterable[Recipe], ids: list[int]) -> tuple:
+    """Расставляет рецепты в порядке `ids`.
+
+    Returns:
+        tuple: Найденные рецепты и список ненайденных `id`.
+
+    """
+    found = {recipe.pk: recipe for recipe in recipes}
+    return (
+        [found[pk] for pk in ids if pk in found],
+        [pk for pk in ids if pk not in found],
+    )
+
+
+class RecipeViewSet(
+    TracingMixin,
+    PhaseTimingMixin,
+    SparseFieldsViewMixin,
+    ModelViewSet,
+    AddDelView,
+):
     """Обработка рецептов.
 
     Вывод, создание, редактирование, добавление/удаление в избранное и список
@@ -50,6 +208,7 @@ class RecipeViewSet(ModelViewSet, AddDelView):
     add_serializer = SmallRecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    sparse_actions = ('list', 'retrieve', 'batch')
 
     def perform_create(
         self,
@@ -66,26 +225,47 @@ class RecipeViewSet(ModelViewSet, AddDelView):
             `QuerySet`: Список запрошенных объектов.
 
         """
-        queryset = self.queryset
+        return filter_recipes(
+            self.queryset,
+            self.request.user,
+            self.request.query_params,
+            self.get_sparse_fields(),
+        )
 
-        author = self.request.query_params.get('author')
-        if author:
-            queryset = queryset.filter(author=author)
-        if self.request.user.is_anonymous:
-            return queryset
+    def _batch(self, ids: list[int]) -> Response:
+        """Рецепты из `ids` одним запросом (и стандартными prefetch)."""
+        recipes, missing = order_by_ids(
+            self.filter_queryset(self.get_queryset()).filter(pk__in=ids),
+            ids,
+        )
+        serializer = timed_serializer(self.get_serializer(recipes, many=True))
+        return Response({'results': serializer.data, 'missing': missing})
 
-        is_in_cart = self.request.query_params.get('is_in_shopping_cart')
-
-        if is_in_cart in Additional.SYMBOL_TRUE_SEARCH:
-            queryset = queryset.filter(shopping_cart__user=self.request.user)
-        elif is_in_cart in Additional.SYMBOL_FALSE_SEARCH:
-            queryset = queryset.exclude(shopping_cart__user=self.request.user)
-        is_favorite = self.request.query_params.get('is_favorited')
-        if is_favorite in Additional.SYMBOL_TRUE_SEARCH:
-            queryset = queryset.filter(in_favorites__user=self.request.user)
-        if is_favorite in Additional.SYMBOL_FALSE_SEARCH:
-            queryset = queryset.exclude(in_favorites__user=self.request.user)
-        return queryset
+    def list(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """Список рецептов, с `?ids=1,2,3` - рецепты из списка."""
+        if 'ids' in request.query_params:
+            return self._batch(batch_ids(request.query_params))
+        return super().list(request, *args, **kwargs)
+
+    @action(
+        methods=('post',),
+        detail=False,
+        permission_classes=(AllowAny,),
+    )
+    def batch(self, request: HttpRequest) -> Response:
+        """Рецепты по списку `id` из тела запроса `{"ids": [...]}`.
+
+        Вариант `GET /recipes/?ids=` для списков, не помещающихся в URL.
+        Вызов метода через url: */recipes/batch/.
+
+        Args:
+            request: Объект запроса.
+
+        Returns:
+            Responce: Рецепты в порядке запроса и ненайденные `id`.
+
+        """
+        return self._batch(batch_ids(request.data))
 
     @action(
         methods=Methods.GET_POST_DEL_METHODS,
@@ -132,7 +312,9 @@ class RecipeViewSet(ModelViewSet, AddDelView):
     def download_shopping_cart(self, request: HttpRequest) -> HttpResponse:
         """Загружает файл *.txt со списком покупок.
 
-        Считает сумму ингредиентов в рецептах выбранных для покупки.
+        Суммы ингредиентов в рецептах, выбранных для покупки, берутся
+        из материализованной таблицы `CartTotal` и сводятся по единицам
+        измерения одной величины (г и кг, мл и л и т.п.).
         Возвращает текстовый файл со списком ингредиентов.
         Вызов метода через url:  */recipes/download_shopping_cart/.
 
@@ -144,7 +326,8 @@ class RecipeViewSet(ModelViewSet, AddDelView):
 
         """
         user = self.request.user
-        if not user.shopping_cart.exists():
+        ingredients = CartTotal.objects.summary(user)
+        if not ingredients:
             return Response(status=HTTP_400_BAD_REQUEST)
 
         filename = f'{user.username}_shopping_list.txt'
@@ -153,17 +336,9 @@ class RecipeViewSet(ModelViewSet, AddDelView):
             f'\n{timezone.now().strftime(DATE_TIME_FORMAT)}\n',
         ]
 
-        ingredients = (
-            Ingredient.objects.filter(
-                ingredientrecipes__recipe__shopping_cart__user=user,
-            )
-            .values('name', measurement=F('measurement_unit'))
-            .annotate(amount=Sum('ingredientrecipes__amount'))
-        )
-
         for ing in ingredients:
             shopping_list.append(
-                f'{ing["name"]}: {ing["amount"]} {ing["measurement"]}',
+                f'{ing["name"]}: {ing["amount"]} {ing["measurement_unit"]}',
             )
 
         shopping_list.append('\nХороших покупок!')
@@ -175,6 +350,31 @@ class RecipeViewSet(ModelViewSet, AddDelView):
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
+    @action(
+        methods=('get',),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_summary(self, request: HttpRequest) -> Response:
+        """Итоги списка покупок в формате JSON.
+
+        Вызов метода через url:  */recipes/shopping_cart_summary/.
+
+        Args:
+            request: Объект запроса.
+
+        Returns:
+            Responce: Список ингредиентов с суммарным количеством.
+
+        """
+        serializer = timed_serializer(
+            CartTotalSerializer(
+                CartTotal.objects.summary(request.user),
+                many=True,
+            ),
+        )
+        return Response(serializer.data)
+
     def get_serializer_class(
         self,
     ) -> [RecipeReadSerializer | RecipeWriteSerializer]:
@@ -187,12 +387,19 @@ class RecipeViewSet(ModelViewSet, AddDelView):
         if self.action in (
             'list',
             'retrieve',
+            'batch',
         ):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
 
-class UserViewSet(DjoserUserViewSet, AddDelView):
+class UserViewSet(
+    TracingMixin,
+    PhaseTimingMixin,
+    SparseFieldsViewMixin,
+    DjoserUserViewSet,
+    AddDelView,
+):
     """Работает с пользователями.
 
     ViewSet для работы с пользователми - отображение и регистрация.
@@ -204,6 +411,16 @@ class UserViewSet(DjoserUserViewSet, AddDelView):
     permission_classes = (AuthorOrReadOnly,)
     pagination_class = CustomPagination
     add_serializer = UserSubscribeSerializer
+    sparse_actions = ('list', 'retrieve', 'me', 'subscriptions')
+
+    def get_queryset(self) -> QuerySet[User]:
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return only_columns(queryset, fields)
 
     @action(
         methods=Methods.GET_POST_DEL_METHODS,
@@ -245,13 +462,20 @@ class UserViewSet(DjoserUserViewSet, AddDelView):
         if request.user.is_anonymous:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
+        fields = self.get_sparse_fields(UserSubscribeSerializer)
         pages = self.paginate_queryset(
-            User.objects.filter(subscribers__user=request.user),
+            subscriptions_queryset(
+                request.user,
+                request.query_params.get('recipes_limit'),
+                fields,
+            ),
         )
-        serializer = UserSubscribeSerializer(
-            pages,
-            many=True,
-            context={'request': request},
+        serializer = timed_serializer(
+            UserSubscribeSerializer(
+                pages,
+                many=True,
+                context={'request': request, 'fields': fields},
+            ),
         )
         return self.get_paginated_response(serializer.data)
 
@@ -265,7 +489,7 @@ class UserViewSet(DjoserUserViewSet, AddDelView):
         return self.retrieve(request, *args, **kwargs)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(TracingMixin, PhaseTimingMixin, ReadOnlyModelViewSet):
     """Работает с тэгами.
 
     Изменение и создание тэгов разрешено только админам.
@@ -278,16 +502,131 @@ class TagViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(TracingMixin, PhaseTimingMixin, ReadOnlyModelViewSet):
     """Работает с ингредиентами.
 
     Изменение и создание тэгов разрешено только админам.
 
     """
 
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.select_related('unit')
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
     pagination_class = None
     filter_backends = (IngredientFilterBackend,)
     search_fields = ('name',)
+
+
+class SubRequest(HttpRequest):
+    """Запрос из пакета: адрес и метод свои, остальное - от пакета.
+
+    Пользователь уже определён при аутентификации пакета и передаётся
+    DRF готовым (`_force_auth_user`), повторной проверки токена нет.
+    Анонимный запрос проходит обычную аутентификацию, чтобы ошибки
+    доступа были те же (401, а не 403).
+
+    """
+
+    def __init__(self, batch: Request, method: str, path: str) -> None:
+        super().__init__()
+        url = urlsplit(path)
+        self.method = method
+        self.path = self.path_info = url.path
+        self.META = {
+            key: value
+            for key, value in batch.META.items()
+            if key not in ('CONTENT_LENGTH', 'CONTENT_TYPE')
+        }
+        self.META.update(
+            REQUEST_METHOD=method,
+            PATH_INFO=url.path,
+            QUERY_STRING=url.query,
+        )
+        self.GET = QueryDict(url.query)
+        self.COOKIES = batch.COOKIES
+        self._scheme = batch.scheme
+        if batch.user.is_authenticated:
+            self._force_auth_user = batch.user
+            self._force_auth_token = batch.auth
+
+    def _get_scheme(self) -> str:
+        return self._scheme
+
+
+class BatchView(TracingMixin, APIView):
+    """Несколько GET/HEAD/OPTIONS-запросов к API одним запросом.
+
+    Тело - `{"requests": [{"method": "GET", "path": "/api/tags/"}, ...],
+    "concurrent": false}`. Запросы выполняются представлениями роутера
+    (`views`) с пользователем пакета. Ответ - `{"responses": [...]}`
+    в порядке запросов, у каждого `status` и `body` (у ответов не DRF -
+    текст и `content_type`). По умолчанию запросы выполняются по очереди
+    на соединении с базой пакета, с `concurrent` - в
+    `BATCH_MAX_CONCURRENCY` потоках со своими соединениями.
+
+    """
+
+    permission_classes = (AllowAny,)
+    # Представления роутера по имени маршрута, задаются в api/urls.py.
+    views: dict = {}
+
+    def post(self, request: Request) -> Response:
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requests = serializer.validated_data['requests']
+        if not serializer.validated_data['concurrent'] or len(requests) == 1:
+            return Response(
+                {'responses': [self._dispatch(item) for item in requests]},
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=min(settings.BATCH_MAX_CONCURRENCY, len(requests)),
+        ) as executor:
+            # Контекст (трассировка, маршрутизация на реплику) копируется
+            # для каждого запроса: один контекст нельзя войти из двух
+            # потоков одновременно.
+            futures = [
+                executor.submit(copy_context().run, self._isolated, item)
+                for item in requests
+            ]
+            return Response(
+                {'responses': [future.result() for future in futures]},
+            )
+
+    def _isolated(self, item: dict) -> dict:
+        """Запрос в отдельном потоке, соединения потока закрываются."""
+        try:
+            return self._dispatch(item)
+        finally:
+            connections.close_all()
+
+    def _dispatch(self, item: dict) -> dict:
+        try:
+            match = resolve(urlsplit(item['path']).path)
+        except Resolver404:
+            match = None
+        if (
+            match is None
+            or match.namespace != 'api'
+            or match.url_name not in self.views
+        ):
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'body': {'detail': exceptions.NotFound.default_detail},
+            }
+
+        request = SubRequest(self.request, item['method'], item['path'])
+        request.resolver_match = match
+        response = self.views[match.url_name](
+            request,
+            *match.args,
+            **match.kwargs,
+        )
+        if isinstance(response, Response):
+            body = None if item['method'] == 'HEAD' else response.data
+            return {'status': response.status_code, 'body': body}
+        return {
+            'status': response.status_code,
+            'body': response.content.decode(response.charset),
+            'content_type': response.get('Content-Type'),
+        }
@@ -0,0 +1,18 @@
+"""Точка входа ASGI.
+
+Включает асинхронные представления для чтения (`ASYNC_READ_VIEWS`).
+Асинхронный ORM работает в отдельном потоке на каждый запрос, поэтому
+постоянные соединения по умолчанию выключены: иначе каждый поток
+оставлял бы своё соединение открытым. Повторно использовать соединения
+под ASGI позволяет пул процесса (`DB_POOL=local`).
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,7 +26,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django_filters',
     'django_cleanup',
-    'sorl.thumbnail',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -35,6 +35,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.TracingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +47,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.SlowQueryMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -90,9 +97,52 @@ DATABASES = {
             'DB_PORT',
             default='5432',
         ),
+        # Секунд жизни соединения между запросами (0 - закрывать сразу)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default='60')),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', default='1') == '1'
+        ),
     },
 }
 
+# Пул соединений с PostgreSQL: local - пул внутри процесса (соединение
+# возвращается в пул после каждого запроса), pgbouncer - работа через
+# PgBouncer в режиме transaction pooling, пусто - без пула. Под gunicorn
+# DB_POOL_SIZE по умолчанию равен числу потоков воркера (gunicorn.conf.py).
+DB_POOL = os.getenv('DB_POOL', default='')
+if DB_POOL == 'local':
+    DATABASES['default'].update(
+        ENGINE='core.pgpool',
+        CONN_MAX_AGE=0,
+        POOL_SIZE=int(os.getenv('DB_POOL_SIZE', default='10')),
+        POOL_MAX_IDLE=int(os.getenv('DB_POOL_MAX_IDLE', default='300')),
+    )
+elif DB_POOL == 'pgbouncer':
+    # Серверные курсоры не переживают смену серверного соединения
+    # между транзакциями.
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_POOL:
+    raise ImproperlyConfigured(f'Неизвестный DB_POOL: {DB_POOL}')
+
+# Реплика для чтения: задаётся переменными DB_REPLICA_NAME, _HOST, _PORT,
+# _USER, _PASSWORD, незаданные параметры берутся у основной базы
+REPLICA_DATABASE = {
+    key: value
+    for key in ('NAME', 'HOST', 'PORT', 'USER', 'PASSWORD')
+    if (value := os.getenv(f'DB_REPLICA_{key}'))
+}
+if REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        **REPLICA_DATABASE,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд клиент читает из основной базы после своей записи
+REPLICA_STICKY_SECONDS = int(
+    os.getenv('REPLICA_STICKY_SECONDS', default='10'),
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -122,6 +172,121 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Поиск N+1 запросов при разработке: log, raise или пусто (выключен)
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE', default='')
+# Сколько запросов одной формы допускается за один запрос к API
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', default='5'))
+
+# Доля запросов с замером фаз (заголовок Server-Timing и запись в лог)
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', default='0'),
+)
+# Заголовок запроса, включающий замер фаз (пусто - только по доле)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', default='')
+
+# Прогрев процесса при запуске (core/warmup.py), manage.py его выключает
+WARMUP = os.getenv('WARMUP', default='1') == '1'
+
+# Асинхронные представления для чтения (включаются в backend/asgi.py)
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='0') == '1'
+
+# Сжатие ответов brotli или gzip (core/compression.py): минимальный
+# размер тела в байтах, представления с общими для всех ответами (ETag
+# и кеш сжатых тел) и число сжатых тел в кеше процесса
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', default='1') == '1'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default='1024'))
+COMPRESSION_CACHE_VIEWS = (
+    'api:tags-list',
+    'api:tags-detail',
+    'api:ingredients-list',
+    'api:ingredients-detail',
+)
+COMPRESSION_CACHE_SIZE = int(
+    os.getenv('COMPRESSION_CACHE_SIZE', default='256'),
+)
+
+# Пакетные запросы /api/batch/: запросов в пакете и потоков
+# для одновременного выполнения
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', default='10'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', default='4'))
+
+# Сбор метрик Prometheus (эндпоинт /metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='1') == '1'
+
+# Общий для воркеров кеш Django: redis://host:6379/0 или
+# memcached://host:11211. Без CACHE_URL кеш хранится в памяти процесса
+# и общим не считается (см. core.cache.is_shared).
+CACHE_URL = os.getenv('CACHE_URL', default='')
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        },
+    }
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        },
+    }
+elif CACHE_URL:
+    raise ImproperlyConfigured(f'Неизвестный CACHE_URL: {CACHE_URL}')
+
+# Кеш токенов аутентификации: записей в LRU процесса, время жизни
+# записи в LRU и в общем кеше в секундах (общий кеш - только с CACHE_URL)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default='4096'))
+AUTH_TOKEN_LOCAL_TTL = float(os.getenv('AUTH_TOKEN_LOCAL_TTL', default='5'))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default='300'))
+
+# Доля запросов, для которых пишется трасса (0 - трассировка выключена)
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', default='0'))
+# Каталог файлов трасс в формате Chrome Trace Event
+TRACING_DIR = os.getenv(
+    'TRACING_DIR',
+    default=os.path.join(BASE_DIR, 'logs', 'traces'),
+)
+
+# Порог медленного SQL-запроса в миллисекундах (0 - журнал выключен)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', default='0'))
+# Доля медленных запросов, для которых сохраняется EXPLAIN (PostgreSQL)
+SLOW_QUERY_EXPLAIN_RATE = float(
+    os.getenv('SLOW_QUERY_EXPLAIN_RATE', default='0.1'),
+)
+# Файл журнала медленных запросов, ротируется по размеру
+SLOW_QUERY_LOG = os.getenv(
+    'SLOW_QUERY_LOG',
+    default=os.path.join(BASE_DIR, 'logs', 'slow_queries.log'),
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.getenv('CORE_LOG_LEVEL', default='INFO'),
+        },
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 NAME_MAX_LENGTH = 100
 UNIT_MAX_LENGTH = 20
 
@@ -144,9 +309,30 @@ DJOSER = {
 AUTH_USER_MODEL = 'users.myUser'
 AUTH_MAX_LENGTH = 100
 
+# JSON в API: orjson (api/renderers.py, api/parsers.py; без пакета -
+# стандартный json) или json - рендерер и парсер DRF
+API_JSON = os.getenv('API_JSON', default='orjson')
+if API_JSON == 'orjson':
+    JSON_RENDERER = 'api.renderers.ORJSONRenderer'
+    JSON_PARSER = 'api.parsers.ORJSONParser'
+elif API_JSON == 'json':
+    JSON_RENDERER = 'rest_framework.renderers.JSONRenderer'
+    JSON_PARSER = 'rest_framework.parsers.JSONParser'
+else:
+    raise ImproperlyConfigured(f'Неизвестный API_JSON: {API_JSON}')
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': 'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     'DEFAULT_FILTER_BACKENDS': [
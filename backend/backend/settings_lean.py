@@ -0,0 +1,30 @@
+"""Облегчённые настройки для команд, не обслуживающих HTTP.
+
+Из `INSTALLED_APPS` убраны приложения, нужные только веб-интерфейсу и
+API: админка, сессии, сообщения, статика, djoser, django-filter и
+шаблоны DRF. Модели проекта, токены и удаление файлов изображений
+(`django_cleanup`) работают как обычно. manage.py выбирает эти
+настройки для команд из `LEAN_COMMANDS`; миграции и `runserver` всегда
+идут с полными настройками.
+"""
+
+from backend.settings import *  # noqa: F401, F403
+from backend.settings import INSTALLED_APPS
+
+HTTP_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django_filters',
+    'rest_framework',
+    'djoser',
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in HTTP_APPS]
+MIDDLEWARE = []
+WARMUP = False
+# Проверки команд загружают маршруты, а они ссылаются на админку и API.
+# Командам маршруты не нужны: URLconf - этот же модуль без маршрутов.
+ROOT_URLCONF = __name__
+urlpatterns = []
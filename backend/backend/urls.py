@@ -3,7 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.metrics import metrics_view
+from core.warmup import ready_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/ready', ready_view, name='ready'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,192 @@
+"""Замеры производительности и сравнение с сохранённым базовым уровнем."""
+
+import base64
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Iterator
+
+import django
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Временная тестовая база и временный `MEDIA_ROOT`.
+
+    Схема строится по моделям, без истории миграций. Реплики
+    (`TEST['MIRROR']`) на время работы смотрят в тестовую базу. База
+    удаляется при выходе из контекста.
+
+    """
+    connection.settings_dict['TEST']['MIGRATE'] = False
+    old_name = connection.creation.create_test_db(
+        verbosity=0,
+        autoclobber=True,
+        serialize=False,
+    )
+    mirrors = {}
+    for mirror in connections.all():
+        if mirror.settings_dict['TEST'].get('MIRROR') == connection.alias:
+            mirrors[mirror] = mirror.settings_dict['NAME']
+            mirror.close()
+            mirror.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        with TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media,
+        ):
+            yield
+    finally:
+        for mirror, name in mirrors.items():
+            mirror.close()
+            mirror.settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def capture_queries() -> Iterator[list[dict]]:
+    """SQL-запросы ко всем базам данных внутри блока.
+
+    Список заполняется при выходе из блока.
+
+    """
+    captured = []
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(database))
+            for database in connections.all()
+        ]
+        yield captured
+    for context in contexts:
+        captured.extend(context.captured_queries)
+
+
+def image_base64() -> str:
+    """Маленькая картинка PNG для полей `Base64ImageField`."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(
+            buffer.getvalue(),
+        ).decode()
+    )
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    """Замеряет время, количество запросов к БД и пик выделенной памяти.
+
+    Время и запросы считаются по `repeat` прогонам после `warmup`
+    прогревочных, память - отдельным прогоном под `tracemalloc`,
+    чтобы трассировка не искажала время.
+
+    Returns:
+        dict: `median_ms`, `min_ms`, `max_ms`, `queries`, `peak_kb`.
+
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with capture_queries() as captured:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        queries = len(captured)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def percentiles(
+    values: list[float],
+    points: tuple[int, ...] = (50, 95, 99),
+) -> dict[str, float]:
+    """Перцентили выборки в миллисекундах, например `{'p50': 12.3}`."""
+    if not values:
+        return {f'p{point}': 0.0 for point in points}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {f'p{point}': round(cuts[point - 1] * 1000, 3) for point in points}
+
+
+def environment() -> dict:
+    """Окружение, в котором выполнены замеры."""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save(results: dict, path: Path) -> None:
+    path.write_text(
+        json.dumps(
+            {'environment': environment(), 'results': results},
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding='utf8',
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Ищет регрессии относительно базового уровня.
+
+    Регрессией считается рост медианного времени или пика памяти больше
+    чем на `threshold` (доля) и любой рост количества запросов.
+
+    Args:
+        baseline: Результаты из сохранённого файла (ключ `results`).
+        current: Текущие результаты в том же формате.
+        threshold: Допустимый относительный рост, например 0.1.
+
+    Returns:
+        list[str]: Описания найденных регрессий.
+
+    """
+    regressions = []
+    for group, scenarios in current.items():
+        for name, result in scenarios.items():
+            base = baseline.get(group, {}).get(name)
+            if base is None:
+                continue
+            label = f'{group}/{name}'
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{label}: запросов {base["queries"]} -> '
+                    f'{result["queries"]}',
+                )
+            for key in ('median_ms', 'peak_kb'):
+                if base[key] and result[key] > base[key] * (1 + threshold):
+                    regressions.append(
+                        f'{label}: {key} {base[key]} -> {result[key]} '
+                        f'(+{(result[key] / base[key] - 1) * 100:.0f}%)',
+                    )
+    return regressions
@@ -0,0 +1,61 @@
+"""Ограниченный кеш процесса с вытеснением давно не использованных записей."""
+
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class LRUCache:
+    """Не больше `size` записей, каждая живёт не дольше `ttl` секунд.
+
+    Кеш общий для потоков воркера, операции защищены блокировкой.
+
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def is_shared(alias: str = 'default') -> bool:
+    """Виден ли кеш Django всем воркерам (Redis, memcached, база).
+
+    Кеш в памяти процесса (по умолчанию, без `CACHE_URL`) у каждого
+    воркера свой: удаление записи в одном воркере другие не видят.
+
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
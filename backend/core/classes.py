@@ -1,12 +1,24 @@
 """Дополнительные классы для настройки основных классов приложения."""
 
-from django.db.models import Model, Q
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Model, Q, QuerySet
+from django.http import HttpRequest, HttpResponse, QueryDict
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (
+    ListSerializer,
+    ModelSerializer,
+    Serializer,
+)
 
 from core.constants import Methods
+from core.timing import phase, timed_serializer
+from core.tracing import span
 
 
 class AddDelView:
@@ -21,6 +33,7 @@ class AddDelView:
 
     add_serializer: ModelSerializer | None = None
 
+    @transaction.atomic
     def _add_del_obj(
         self,
         obj_id: int | str,
@@ -29,6 +42,9 @@ class AddDelView:
     ) -> Response:
         """Добавляет/удаляет связь `many to many`.
 
+        Выполняется в одной транзакции с обновлением связанных данных
+        (например, итогов корзины покупок `CartTotal`).
+
         Args:
             obj_id:
                 `id` объекта, с которым требуется создать/удалить связь.
@@ -42,7 +58,9 @@ class AddDelView:
 
         """
         obj = get_object_or_404(self.queryset, id=obj_id)
-        serializer: ModelSerializer = self.add_serializer(obj)
+        serializer: ModelSerializer = timed_serializer(
+            self.add_serializer(obj, context=self.get_serializer_context()),
+        )
         m2m_obj = m_to_m_model.objects.filter(q & Q(user=self.request.user))
 
         if (
@@ -60,3 +78,151 @@ class AddDelView:
                 {'errors': f'Вы не подписаны на {obj.username}!'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+
+
+class PhaseTimingMixin:
+    """
+    Замеряет фазы обработки запроса в DRF для заголовка `Server-Timing`.
+
+    Аутентификация, проверка прав, выборка объектов и сериализация
+    учитываются в фазах `auth`, `permissions`, `queryset` и `serialize`.
+    Без включённого замера методы работают как в родительском классе.
+
+    """
+
+    def perform_authentication(self, request: Request) -> None:
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request: Request) -> None:
+        with phase('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request: Request, obj: Model) -> None:
+        with phase('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def get_object(self) -> Model:
+        with phase('queryset'):
+            return super().get_object()
+
+    def paginate_queryset(self, queryset: QuerySet) -> list | None:
+        with phase('queryset'):
+            return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs) -> Serializer:
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+
+class TracingMixin:
+    """
+    Выделяет обработку запроса представлением в интервал трассы.
+
+    Интервал называется по классу и действию (`RecipeViewSet.list`),
+    вне трассы метод работает как в родительском классе.
+
+    """
+
+    def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        action_map = getattr(self, 'action_map', None) or {}
+        action = action_map.get(request.method.lower(), request.method)
+        with span(f'{type(self).__name__}.{action}'):
+            return super().dispatch(request, *args, **kwargs)
+
+
+def requested_fields(
+    params: QueryDict,
+    available: Iterable[str],
+) -> frozenset[str] | None:
+    """Поля ответа по параметрам `fields` и `omit` запроса.
+
+    Оба параметра - имена полей через запятую: `fields` оставляет только
+    перечисленные, `omit` убирает перечисленные.
+
+    Args:
+        params: Параметры запроса.
+        available: Все поля сериализатора.
+
+    Returns:
+        frozenset[str] | None: Выбранные поля, `None` - все поля.
+
+    Raises:
+        ValidationError: Неизвестные имена полей.
+
+    """
+    selected = {}
+    for param in ('fields', 'omit'):
+        if param in params:
+            selected[param] = {
+                name.strip()
+                for value in params.getlist(param)
+                for name in value.split(',')
+                if name.strip()
+            }
+    if not selected:
+        return None
+    available = frozenset(available)
+    errors = {
+        param: f'Неизвестные поля: {", ".join(sorted(names - available))}.'
+        for param, names in selected.items()
+        if names - available
+    }
+    if errors:
+        raise ValidationError(errors)
+    return frozenset(
+        selected.get('fields') or available,
+    ) - selected.get('omit', set())
+
+
+class SparseFieldsMixin:
+    """
+    Выводит только поля из контекста `fields` (см. `SparseFieldsViewMixin`).
+
+    Ограничение действует на сериализатор верхнего уровня ответа,
+    вложенные сериализаторы выводят все свои поля. Невыбранные поля
+    не создаются и не вычисляются.
+
+    """
+
+    def get_field_names(self, declared_fields: dict, info) -> list[str]:
+        names = super().get_field_names(declared_fields, info)
+        fields = self.context.get('fields')
+        if fields is None or not (
+            self.parent is None
+            or (
+                isinstance(self.parent, ListSerializer)
+                and self.parent.parent is None
+            )
+        ):
+            return names
+        return [name for name in names if name in fields]
+
+
+class SparseFieldsViewMixin:
+    """
+    Поддерживает параметры `?fields=` и `?omit=` в действиях `sparse_actions`.
+
+    Выбранные поля передаются сериализатору в контексте (`fields`),
+    представление может по ним упростить выборку (`get_sparse_fields`).
+
+    """
+
+    sparse_actions: tuple[str, ...] = ('list', 'retrieve')
+
+    def get_sparse_fields(
+        self,
+        serializer_class: type[Serializer] | None = None,
+    ) -> frozenset[str] | None:
+        """Выбранные поля ответа, `None` - все поля."""
+        if self.action not in self.sparse_actions:
+            return None
+        serializer_class = serializer_class or self.get_serializer_class()
+        return requested_fields(
+            self.request.query_params,
+            serializer_class.Meta.fields,
+        )
+
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
@@ -44,3 +44,13 @@ class Limits:
     MIN_AMOUNT_INGREDIENTS = 1
     # Максимальное количество ингредиентов для рецепта
     MAX_AMOUNT_INGREDIENTS = 32
+    # Размер пачки при пересчете итогов корзин покупок
+    CART_TOTALS_BATCH_SIZE = 1000
+    # Размер пачки при загрузке ингредиентов
+    INGREDIENTS_BATCH_SIZE = 5000
+    # Размер пачки при выгрузке/загрузке рецептов
+    BACKUP_CHUNK_SIZE = 500
+    # Размер пачки при генерации синтетических данных
+    FAKE_DATA_BATCH_SIZE = 5000
+    # Максимальное количество рецептов в пакетном запросе по списку id
+    RECIPES_BATCH_SIZE = 100
@@ -0,0 +1,74 @@
+"""Метрики Prometheus и эндпоинт `/metrics`.
+
+При запуске под gunicorn с несколькими воркерами задайте переменную
+окружения `PROMETHEUS_MULTIPROC_DIR`: каждый воркер пишет значения
+в свои файлы в этом каталоге, эндпоинт суммирует их по всем воркерам.
+"""
+
+import os
+
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUESTS = Counter(
+    'http_requests_total',
+    'Запросы по представлениям, методам и кодам ответа.',
+    ('view', 'method', 'status'),
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', 'method'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Размер тела ответа.',
+    ('view', 'method'),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'Количество SQL-запросов.',
+    ('view', 'method'),
+)
+DB_TIME = Counter(
+    'db_query_duration_seconds_total',
+    'Суммарное время SQL-запросов.',
+    ('view', 'method'),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Обращения к кешу: hit или miss.',
+    ('cache', 'result'),
+)
+IMAGE_PROCESSING = Histogram(
+    'image_processing_duration_seconds',
+    'Время обработки картинок рецептов.',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Метрики в текстовом формате Prometheus."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,543 @@
+"""Промежуточные слои для разработки и диагностики."""
+
+import json
+import logging
+import random
+import traceback
+from contextlib import ExitStack
+from hashlib import sha256
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    set_response_etag,
+)
+
+from core import compression, metrics, routers, timing, tracing
+from core.cache import LRUCache, is_shared
+from core.queries import RepeatDetector, SlowQueryRecorder
+
+logger = logging.getLogger(__name__)
+
+
+def wrap_connections(wrapper, aliases: list[str] | None = None) -> ExitStack:
+    """Ставит `execute_wrapper` на соединения текущего потока.
+
+    Асинхронный ORM выполняет запросы в отдельном потоке запроса, поэтому
+    асинхронные слои вызывают функцию через `sync_to_async` - в том же
+    потоке, что и запросы представления.
+
+    """
+    stack = ExitStack()
+    for alias in aliases or connections:
+        stack.enter_context(connections[alias].execute_wrapper(wrapper))
+    return stack
+
+
+class NPlusOneError(Exception):
+    """Запрос выполнил повторяющиеся SQL-запросы одной формы."""
+
+
+class NPlusOneMiddleware:
+    """Ищет повторяющиеся SQL-запросы (N+1) в каждом запросе к API.
+
+    Включается настройкой `NPLUSONE_MODE`: `log` - предупреждение в лог,
+    `raise` - исключение `NPlusOneError`. Если режим не задан, слой
+    исключается из цепочки при запуске и ничего не стоит.
+
+    """
+
+    def __init__(self, get_response) -> None:
+        self.mode = settings.NPLUSONE_MODE
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.threshold = settings.NPLUSONE_THRESHOLD
+        self.root = str(settings.BASE_DIR)
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        detector = RepeatDetector(self.threshold, self.root)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            response = self.get_response(request)
+
+        repeats = detector.repeats()
+        if repeats:
+            message = self._message(request, repeats)
+            if self.mode == 'raise':
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+    @staticmethod
+    def _message(request: HttpRequest, repeats: list) -> str:
+        path = request.get_full_path()
+        lines = [f'Повторяющиеся SQL-запросы в {request.method} {path}:']
+        for shape, count, sql, stack in repeats:
+            lines.append(f'{count} x {shape}')
+            lines.append(f'  пример: {sql}')
+            lines.append('  первый повтор:')
+            frames = [frame for frame in stack if frame.filename != __file__]
+            for line in ''.join(traceback.format_list(frames)).splitlines():
+                lines.append(f'  {line}')
+        return '\n'.join(lines)
+
+
+class ServerTimingMiddleware:
+    """Замеряет фазы обработки выбранных запросов.
+
+    Результат отдаётся в заголовке `Server-Timing` и пишется в лог
+    одной строкой JSON вместе с числом SQL-запросов. Замеряется доля
+    запросов `SERVER_TIMING_SAMPLE_RATE` и все запросы с заголовком
+    `SERVER_TIMING_HEADER`. Если выключено и то и другое, слой
+    исключается из цепочки при запуске.
+
+    """
+
+    def __init__(self, get_response) -> None:
+        self.rate = settings.SERVER_TIMING_SAMPLE_RATE
+        header = settings.SERVER_TIMING_HEADER
+        if not self.rate and not header:
+            raise MiddlewareNotUsed
+        self.meta_key = header and 'HTTP_' + header.upper().replace('-', '_')
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not (
+            (self.meta_key and self.meta_key in request.META)
+            or (self.rate and random.random() < self.rate)
+        ):
+            return self.get_response(request)
+
+        timer = timing.RequestTimer()
+        token = timing.activate(timer)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+
+        response['Server-Timing'] = timer.header()
+        logger.info(
+            json.dumps(
+                {
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'total_ms': round(timer.total() * 1000, 1),
+                    'queries': timer.queries,
+                    **{
+                        f'{name}_ms': round(seconds * 1000, 1)
+                        for name, seconds in timer.phases.items()
+                    },
+                },
+                ensure_ascii=False,
+            ),
+        )
+        return response
+
+    def process_template_response(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+    ) -> HttpResponse:
+        """Относит отрисовку ответа DRF к фазе `render`."""
+        timer = timing.current()
+        if timer is not None:
+            started = perf_counter()
+            response.add_post_render_callback(
+                lambda response: timer.add('render', perf_counter() - started),
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Собирает метрики Prometheus по каждому запросу.
+
+    Представление определяется по имени маршрута (`api:recipes-list`,
+    `api:recipes-favorite` и т.п.), поэтому число меток ограничено.
+    Выключается настройкой `METRICS_ENABLED`. Работает и под ASGI.
+
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = timing.RequestTimer()
+        with wrap_connections(timer):
+            response = self.get_response(request)
+        return self._record(request, response, timer)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        timer = timing.RequestTimer()
+        stack = await sync_to_async(wrap_connections)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._record(request, response, timer)
+
+    @staticmethod
+    def _record(
+        request: HttpRequest,
+        response: HttpResponse,
+        timer: timing.RequestTimer,
+    ) -> HttpResponse:
+        elapsed = timer.total()
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        method = request.method
+        metrics.REQUESTS.labels(view, method, response.status_code).inc()
+        metrics.LATENCY.labels(view, method).observe(elapsed)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(view, method).observe(
+                len(response.content),
+            )
+        if timer.queries:
+            metrics.DB_QUERIES.labels(view, method).inc(timer.queries)
+            metrics.DB_TIME.labels(view, method).inc(timer.phases['db'])
+        return response
+
+
+class SlowQueryMiddleware:
+    """Пишет в лог SQL-запросы дольше `SLOW_QUERY_MS` миллисекунд.
+
+    Лог - файл `SLOW_QUERY_LOG` с ротацией (см. `LOGGING`), сводку
+    строит команда `slow_queries`. При нулевом пороге слой исключается
+    из цепочки при запуске.
+
+    """
+
+    def __init__(self, get_response) -> None:
+        if not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        Path(settings.SLOW_QUERY_LOG).parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = settings.SLOW_QUERY_MS / 1000
+        self.explain_rate = settings.SLOW_QUERY_EXPLAIN_RATE
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        recorder = SlowQueryRecorder(
+            request,
+            self.threshold,
+            self.explain_rate,
+        )
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
+
+
+class TracingMiddleware:
+    """Записывает трассы доли запросов `TRACING_SAMPLE_RATE`.
+
+    Корневой интервал - запрос целиком, вложенные - представление,
+    поля сериализаторов, SQL-запросы и обработка изображений. При
+    нулевой доле слой исключается из цепочки при запуске.
+
+    """
+
+    def __init__(self, get_response) -> None:
+        if not settings.TRACING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not tracing.sampled():
+            return self.get_response(request)
+
+        with tracing.trace(
+            f'{request.method} {request.path}',
+            method=request.method,
+            path=request.path,
+        ) as root, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(tracing.query_span),
+                )
+            response = self.get_response(request)
+            if request.resolver_match is not None:
+                root.name = (
+                    f'{request.method} {request.resolver_match.view_name}'
+                )
+            root.attributes['status'] = response.status_code
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплики для GET, HEAD и OPTIONS.
+
+    Запросы, изменяющие данные, работают с основной базой. Если запрос
+    что-то записал, следующие запросы того же клиента
+    `REPLICA_STICKY_SECONDS` секунд читают из основной базы и видят свои
+    изменения несмотря на отставание реплики. Метка хранится у клиента
+    в подписанной cookie, срок проверяется по подписи, поэтому её видят
+    все воркеры. Клиентам без cookie (токен в заголовке) метку хранит
+    общий кеш по заголовку `Authorization` или cookie сессии - только
+    если он общий для воркеров (`CACHE_URL`): кеш процесса не виден
+    воркеру, получившему следующий запрос. Без реплики в `DATABASES`
+    слой исключается из цепочки при запуске. Работает и под ASGI.
+
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    COOKIE = 'replica_pin'
+    SALT = 'core.middleware.ReplicaRoutingMiddleware'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if routers.REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.sticky = settings.REPLICA_STICKY_SECONDS
+        self.shared_cache = is_shared()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = self._client_key(request)
+        replica = request.method in self.SAFE_METHODS and not (
+            self._cookie_pinned(request) or (key and cache.get(key))
+        )
+        with routers.reads_from_replica(replica) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            self._pin(request, response)
+            if key:
+                cache.set(key, True, self.sticky)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        key = self._client_key(request)
+        replica = request.method in self.SAFE_METHODS and not (
+            self._cookie_pinned(request) or (key and await cache.aget(key))
+        )
+        state = routers.RoutingState(replica)
+        token = routers.activate(state)
+        try:
+            stack = await sync_to_async(wrap_connections)(
+                state,
+                [DEFAULT_DB_ALIAS],
+            )
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            routers.deactivate(token)
+        if state.wrote:
+            self._pin(request, response)
+            if key:
+                await cache.aset(key, True, self.sticky)
+        return response
+
+    def _cookie_pinned(self, request: HttpRequest) -> bool:
+        return bool(
+            request.get_signed_cookie(
+                self.COOKIE,
+                default=None,
+                salt=self.SALT,
+                max_age=self.sticky,
+            ),
+        )
+
+    def _pin(self, request: HttpRequest, response: HttpResponse) -> None:
+        response.set_signed_cookie(
+            self.COOKIE,
+            '1',
+            salt=self.SALT,
+            max_age=self.sticky,
+            secure=request.is_secure(),
+            httponly=True,
+            samesite='Lax',
+        )
+
+    def _client_key(self, request: HttpRequest) -> str | None:
+        if not self.shared_cache:
+            return None
+        credentials = request.META.get(
+            'HTTP_AUTHORIZATION',
+        ) or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credentials:
+            return None
+        return 'replica-sticky:' + sha256(credentials.encode()).hexdigest()
+
+
+class CompressionMiddleware:
+    """Сжимает ответы brotli или gzip (см. core/compression.py).
+
+    Сжимаются тела от `COMPRESSION_MIN_SIZE` байт, кроме уже сжатых
+    форматов. Потоковые ответы сжимаются по частям, не собираясь
+    в памяти. Ответы представлений из `COMPRESSION_CACHE_VIEWS`
+    одинаковы для всех клиентов: они получают ETag (на `If-None-Match`
+    - ответ 304), сжимаются с наибольшей степенью один раз, а сжатые
+    тела хранятся в кеше процесса по ETag. Остальные ответы на запросы
+    с учётными данными сжимаются с защитой от BREACH. Выключается
+    настройкой `COMPRESSION_ENABLED`. Работает и под ASGI.
+
+    """
+
+    sync_capable = True
+    async_capable = True
+    # Тело в кеше определяется ETag и не устаревает, срок ограничивает
+    # только память под тела прошлых версий.
+    CACHE_TTL = 3600
+
+    def __init__(self, get_response) -> None:
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.cached_views = frozenset(settings.COMPRESSION_CACHE_VIEWS)
+        self.cache = LRUCache(settings.COMPRESSION_CACHE_SIZE, self.CACHE_TTL)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+    ) -> HttpResponse:
+        shared = self._shared(request, response)
+        if shared:
+            if not response.has_header('ETag'):
+                set_response_etag(response)
+            patch_vary_headers(response, ('Accept-Encoding',))
+            conditional = get_conditional_response(
+                request,
+                etag=response['ETag'],
+                response=response,
+            )
+            if conditional is not response:
+                return conditional
+        if (
+            response.has_header('Content-Encoding')
+            or not compression.compressible(response.get('Content-Type', ''))
+            or (
+                not response.streaming
+                and len(response.content) < self.min_size
+            )
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        credentials = not shared and bool(
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+        )
+        encoding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            (compression.GZIP,) if credentials else compression.ENCODINGS,
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = compression.StreamCompressor(encoding, credentials)
+            if response.is_async:
+                response.streaming_content = compressor.aiterate(
+                    response.streaming_content,
+                )
+            else:
+                response.streaming_content = compressor.iterate(
+                    response.streaming_content,
+                )
+            del response['Content-Length']
+        else:
+            with timing.phase('compress'):
+                content = self._content(
+                    request,
+                    response,
+                    encoding,
+                    shared,
+                    credentials,
+                )
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Сжатое тело - другое представление ресурса (RFC 9110, 8.8.1).
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def _shared(self, request: HttpRequest, response: HttpResponse) -> bool:
+        """Общий для всех клиентов ответ, который можно кешировать."""
+        match = request.resolver_match
+        return (
+            match is not None
+            and match.view_name in self.cached_views
+            and request.method in ('GET', 'HEAD')
+            and response.status_code == 200
+            and not response.streaming
+        )
+
+    def _content(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        encoding: str,
+        shared: bool,
+        credentials: bool,
+    ) -> bytes:
+        if not shared:
+            return compression.compress(
+                response.content,
+                encoding,
+                randomize=credentials,
+            )
+        key = (response['ETag'], encoding)
+        content = self.cache.get(key)
+        if content is None:
+            # Высокая степень окупается для справочника целиком, ответы
+            # поиска (`?name=`) редко повторяются.
+            content = compression.compress(
+                response.content,
+                encoding,
+                (
+                    compression.DYNAMIC
+                    if request.META.get('QUERY_STRING')
+                    else compression.CACHED
+                ),
+            )
+            self.cache.set(key, content)
+        return content
@@ -0,0 +1,113 @@
+"""PostgreSQL с пулом соединений внутри процесса.
+
+Закрытое Django соединение возвращается в пул и выдаётся следующему
+запросу без TCP-соединения и аутентификации. Пул общий для потоков
+процесса; после `fork` воркер создаёт свой пул, унаследованные
+соединения не используются. Настройки - ключи `POOL_SIZE` (сколько
+свободных соединений хранить) и `POOL_MAX_IDLE` (секунды, после
+которых свободное соединение закрывается) в `DATABASES`.
+"""
+
+import os
+import threading
+from collections import deque
+from time import monotonic
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Свободные соединения с одной базой данных."""
+
+    def __init__(self, size: int, max_idle: float) -> None:
+        self.size = size
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def get(self) -> tuple | None:
+        """Свободное соединение и его уровень изоляции или `None`."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                released, connection, isolation_level = self._idle.pop()
+            if connection.closed or monotonic() - released > self.max_idle:
+                connection.close()
+                continue
+            return connection, isolation_level
+
+    def put(self, connection, isolation_level) -> None:
+        """Возвращает соединение в пул или закрывает его."""
+        status = connection.info.transaction_status
+        if (
+            connection.closed
+            or status == extensions.TRANSACTION_STATUS_UNKNOWN
+        ):
+            connection.close()
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((monotonic(), connection, isolation_level))
+                return
+        connection.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for _, connection, _ in idle:
+            connection.close()
+
+
+def get_pool(alias: str, settings_dict: dict) -> ConnectionPool:
+    """Пул псевдонима и базы данных текущего процесса."""
+    key = (alias, settings_dict['NAME'])
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[key] = ConnectionPool(
+                    settings_dict.get('POOL_SIZE', 10),
+                    settings_dict.get('POOL_MAX_IDLE', 300),
+                )
+    return pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(
+        self,
+        test_database_name: str,
+        verbosity: int,
+    ) -> None:
+        # Свободные соединения с тестовой базой не дали бы её удалить.
+        for (_, name), pool in list(_pools.items()):
+            if name == test_database_name:
+                pool.clear()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params: dict):
+        pooled = get_pool(self.alias, self.settings_dict).get()
+        if pooled is None:
+            return super().get_new_connection(conn_params)
+        connection, self.isolation_level = pooled
+        return connection
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                get_pool(self.alias, self.settings_dict).put(
+                    self.connection,
+                    self.isolation_level,
+                )
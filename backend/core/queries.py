@@ -0,0 +1,185 @@
+"""Отпечатки SQL-запросов, поиск повторов и журнал медленных запросов."""
+
+import json
+import logging
+import random
+import re
+import traceback
+from collections import defaultdict
+from time import perf_counter
+
+from django.http import HttpRequest
+from django.utils import timezone
+
+slow_logger = logging.getLogger('core.slow_queries')
+
+# Строки, числа и списки значений заменяются заполнителями, чтобы
+# запросы одной формы с разными параметрами давали один отпечаток.
+LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql: str) -> str:
+    """Форма запроса без литералов."""
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def repeated(
+    queries: list[dict],
+    threshold: int = 1,
+) -> list[tuple[str, int, str]]:
+    """Группирует запросы по отпечатку.
+
+    Args:
+        queries: Запросы в формате `connection.queries`.
+        threshold: Группы с числом повторов не больше порога отбрасываются.
+
+    Returns:
+        Список `(отпечаток, количество, первый запрос)` по убыванию
+        количества.
+
+    """
+    groups = defaultdict(list)
+    for query in queries:
+        groups[fingerprint(query['sql'])].append(query['sql'])
+    return sorted(
+        (
+            (shape, len(sqls), sqls[0])
+            for shape, sqls in groups.items()
+            if len(sqls) > threshold
+        ),
+        key=lambda group: -group[1],
+    )
+
+
+class RepeatDetector:
+    """Обёртка `connection.execute_wrapper`, считающая запросы по форме.
+
+    Для каждой формы запоминается стек вызова первого повтора: по нему
+    видно, какой код (например, метод сериализатора) выполняет запрос
+    в цикле. В стеке остаются только кадры из кода проекта.
+
+    """
+
+    def __init__(self, threshold: int, root: str) -> None:
+        self.threshold = threshold
+        self.root = root
+        self.counts = defaultdict(int)
+        self.samples = {}
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == 1:
+            self.samples[shape] = f'{sql} {params!r}'
+        elif self.counts[shape] == 2:
+            self.stacks[shape] = self._stack()
+        return execute(sql, params, many, context)
+
+    def _stack(self) -> list[traceback.FrameSummary]:
+        return [
+            frame
+            for frame in traceback.extract_stack()
+            if frame.filename.startswith(self.root)
+            and frame.filename != __file__
+        ]
+
+    def repeats(self) -> list[tuple[str, int, str, list]]:
+        """Формы, повторившиеся больше порога.
+
+        Returns:
+            Список `(отпечаток, количество, первый запрос, стек)`
+            по убыванию количества.
+
+        """
+        return sorted(
+            (
+                (shape, count, self.samples[shape], self.stacks[shape])
+                for shape, count in self.counts.items()
+                if count > self.threshold
+            ),
+            key=lambda repeat: -repeat[1],
+        )
+
+
+class SlowQueryRecorder:
+    """Обёртка `connection.execute_wrapper`, записывающая медленные запросы.
+
+    Каждый запрос дольше порога пишется строкой JSON в логгер
+    `core.slow_queries` вместе с представлением и действием DRF.
+    На PostgreSQL для доли таких запросов сохраняется план
+    `EXPLAIN (FORMAT JSON)`; он строится отдельным курсором драйвера,
+    минуя обёртки, и сам запрос не выполняет.
+
+    """
+
+    def __init__(
+        self,
+        request: HttpRequest,
+        threshold: float,
+        explain_rate: float,
+    ) -> None:
+        self.request = request
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        result = execute(sql, params, many, context)
+        duration = perf_counter() - started
+        if duration >= self.threshold:
+            self._record(sql, params, many, context['connection'], duration)
+        return result
+
+    def _record(self, sql, params, many, connection, duration) -> None:
+        match = self.request.resolver_match
+        action = None
+        if match is not None:
+            actions = getattr(match.func, 'actions', None) or {}
+            action = actions.get(self.request.method.lower())
+        record = {
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'fingerprint': fingerprint(sql),
+            'sql': sql,
+            'view': match.view_name if match else None,
+            'action': action,
+            'method': self.request.method,
+            'path': self.request.path,
+        }
+        if (
+            connection.vendor == 'postgresql'
+            and not many
+            and sql.lstrip()[:6].upper() == 'SELECT'
+            and random.random() < self.explain_rate
+        ):
+            record['explain'] = self._explain(sql, params, connection)
+        slow_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    @staticmethod
+    def _explain(sql, params, connection) -> list | str:
+        """План запроса; ошибка EXPLAIN не должна ломать транзакцию."""
+        savepoint = connection.in_atomic_block
+        with connection.connection.cursor() as cursor:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute(
+                    f'EXPLAIN (ANALYZE off, FORMAT JSON) {sql}',
+                    params,
+                )
+                plan = cursor.fetchone()[0]
+            except Exception as error:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                return f'EXPLAIN не выполнен: {error}'
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
@@ -0,0 +1,91 @@
+"""Чтение с реплики базы данных для безопасных запросов к API.
+
+Реплика используется только внутри `reads_from_replica(True)`, который
+включает `ReplicaRoutingMiddleware` для GET, HEAD и OPTIONS. Первая же
+запись переключает остаток запроса на основную базу, чтобы запрос
+видел свои изменения. Вне запросов (команды, shell) всё идёт
+в основную базу.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator
+
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+REPLICA = 'replica'
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class RoutingState:
+    """Можно ли читать с реплики и была ли запись в основную базу.
+
+    Экземпляр служит обёрткой `execute_wrapper` основной базы:
+    `db_for_write` вызывается и без записи (например, при присваивании
+    внешнего ключа), поэтому запись определяется по SQL.
+
+    """
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica: bool) -> None:
+        self.replica = replica
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in WRITES:
+            self.replica = False
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+_state: ContextVar[RoutingState | None] = ContextVar(
+    'routing_state',
+    default=None,
+)
+
+
+def activate(state: RoutingState) -> Token:
+    return _state.set(state)
+
+
+def deactivate(token: Token) -> None:
+    _state.reset(token)
+
+
+@contextmanager
+def reads_from_replica(replica: bool) -> Iterator[RoutingState]:
+    """Состояние маршрутизации одного запроса."""
+    state = RoutingState(replica)
+    token = activate(state)
+    try:
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(state):
+            yield state
+    finally:
+        deactivate(token)
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплику, а запись в основную базу.
+
+    Подключается настройкой `DATABASE_ROUTERS`, когда задана реплика.
+
+    """
+
+    def db_for_read(self, model: type[models.Model], **hints) -> str:
+        state = _state.get()
+        if state is not None and state.replica:
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: type[models.Model], **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(
+        self,
+        obj1: models.Model,
+        obj2: models.Model,
+        **hints,
+    ) -> bool:
+        # Реплика содержит те же данные, что и основная база.
+        return True
@@ -0,0 +1,103 @@
+"""Замер фаз обработки запроса для заголовка `Server-Timing`.
+
+Замер включается для отдельных запросов (см. `ServerTimingMiddleware`).
+Если для текущего запроса замер не включён, `phase` возвращает пустой
+контекстный менеджер и почти ничего не стоит.
+"""
+
+from collections import defaultdict
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from time import perf_counter
+
+_current: ContextVar['RequestTimer | None'] = ContextVar(
+    'request_timer',
+    default=None,
+)
+_noop = nullcontext()
+
+
+class RequestTimer:
+    """Суммарное время фаз одного запроса и число SQL-запросов.
+
+    Экземпляр также служит обёрткой `connection.execute_wrapper`
+    и копит время в фазе `db`.
+
+    """
+
+    def __init__(self) -> None:
+        self.started = perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] += seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.phases['db'] += perf_counter() - started
+
+    def total(self) -> float:
+        return perf_counter() - self.started
+
+    def header(self) -> str:
+        """Значение заголовка `Server-Timing`, время в миллисекундах."""
+        metrics = [
+            f'{name};dur={seconds * 1000:.1f}'
+            for name, seconds in self.phases.items()
+        ]
+        metrics.append(f'queries;desc="{self.queries}"')
+        metrics.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer: RequestTimer, name: str) -> None:
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.timer.add(self.name, perf_counter() - self.started)
+
+
+def activate(timer: RequestTimer) -> Token:
+    return _current.set(timer)
+
+
+def deactivate(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> RequestTimer | None:
+    return _current.get()
+
+
+def phase(name: str) -> _Phase | nullcontext:
+    """Контекстный менеджер, добавляющий время блока к фазе `name`."""
+    timer = _current.get()
+    if timer is None:
+        return _noop
+    return _Phase(timer, name)
+
+
+def timed_serializer(serializer):
+    """Относит построение `serializer.data` к фазе `serialize`."""
+    if _current.get() is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed(instance):
+        with phase('serialize'):
+            return to_representation(instance)
+
+    serializer.to_representation = timed
+    return serializer
@@ -0,0 +1,128 @@
+"""Локальная трассировка запросов деревом вложенных интервалов (span).
+
+Трасса записывается файлом JSON в формате Chrome Trace Event в каталог
+`TRACING_DIR`; его открывают Perfetto, speedscope и chrome://tracing
+как flame graph. Решение о записи трассы принимается при её начале
+(`sampled`), внешний сборщик не нужен. Вне трассы `span` возвращает
+пустой контекстный менеджер и почти ничего не стоит.
+"""
+
+import json
+import os
+import random
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from time import perf_counter, strftime
+from typing import Iterator
+
+from django.conf import settings
+
+_current: ContextVar['Span | None'] = ContextVar('span', default=None)
+_noop = nullcontext()
+
+
+class Span:
+    """Интервал трассы с атрибутами и вложенными интервалами."""
+
+    __slots__ = ('name', 'attributes', 'children', 'start', 'end', 'token')
+
+    def __init__(self, name: str, attributes: dict) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+
+    def __enter__(self) -> 'Span':
+        parent = _current.get()
+        if parent is not None:
+            parent.children.append(self)
+        self.token = _current.set(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end = perf_counter()
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        _current.reset(self.token)
+
+    def events(self, pid: int, tid: int) -> Iterator[dict]:
+        """События `X` формата Chrome Trace Event, время в микросекундах."""
+        yield {
+            'name': self.name,
+            'ph': 'X',
+            'ts': round(self.start * 1e6, 3),
+            'dur': round((self.end - self.start) * 1e6, 3),
+            'pid': pid,
+            'tid': tid,
+            'args': self.attributes,
+        }
+        for child in self.children:
+            yield from child.events(pid, tid)
+
+
+def sampled() -> bool:
+    """Записывать ли новую трассу (доля `TRACING_SAMPLE_RATE`)."""
+    rate = settings.TRACING_SAMPLE_RATE
+    return bool(rate) and random.random() < rate
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Span]:
+    """Корневой интервал; при выходе трасса записывается в файл."""
+    root = Span(name, attributes)
+    token = _current.set(None)
+    try:
+        with root:
+            yield root
+    finally:
+        _current.reset(token)
+        export(root)
+
+
+def span(name: str, **attributes) -> Span | nullcontext:
+    """Вложенный интервал текущей трассы."""
+    if _current.get() is None:
+        return _noop
+    return Span(name, attributes)
+
+
+def traced(func):
+    """Декоратор: вызов функции внутри трассы становится интервалом."""
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return func(*args, **kwargs)
+        with Span(name, {}):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def query_span(execute, sql, params, many, context):
+    """Обёртка `connection.execute_wrapper`: интервал на каждый SQL-запрос."""
+    with span('db', sql=sql, alias=context['connection'].alias):
+        return execute(sql, params, many, context)
+
+
+def export(root: Span) -> Path:
+    """Записывает трассу в `TRACING_DIR` и возвращает путь к файлу."""
+    directory = Path(settings.TRACING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    trace_id = uuid.uuid4().hex
+    path = directory / f'{strftime("%Y%m%d-%H%M%S")}-{trace_id}.json'
+    data = {
+        'traceEvents': list(
+            root.events(os.getpid(), threading.get_ident()),
+        ),
+        'displayTimeUnit': 'ms',
+        'otherData': {'trace_id': trace_id, 'name': root.name},
+    }
+    with path.open('w', encoding='utf8') as file:
+        json.dump(data, file, ensure_ascii=False, default=str)
+    return path
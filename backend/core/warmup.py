@@ -0,0 +1,127 @@
+"""Прогрев процесса до первого запроса и эндпоинт готовности.
+
+Первые запросы свежего воркера иначе платят за ленивые структуры:
+регулярные выражения маршрутов, поля сериализаторов, соединение
+с базой и холодные страницы таблиц тегов и ингредиентов. `run`
+выполняет это заранее и отмечает процесс готовым, `/health/ready`
+до этого отвечает 503. Прогрев запускается из `ApiConfig.ready` (при
+`preload_app` - в мастере gunicorn, воркеры наследуют результат)
+и выключается настройкой `WARMUP`: manage.py выключает его для команд.
+"""
+
+import json
+import logging
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpRequest, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_lock = threading.Lock()
+
+
+def compile_routes() -> None:
+    """Компилирует регулярные выражения маршрутов и словари `reverse`."""
+    from django.urls import URLResolver, get_resolver, reverse
+
+    def compile_patterns(patterns: list) -> None:
+        for pattern in patterns:
+            pattern.pattern.regex
+            if isinstance(pattern, URLResolver):
+                compile_patterns(pattern.url_patterns)
+
+    compile_patterns(get_resolver().url_patterns)
+    reverse('api:recipes-list')
+
+
+def build_serializers() -> None:
+    """Создаёт поля всех сериализаторов API по описаниям моделей."""
+    from rest_framework.serializers import BaseSerializer
+
+    from api import serializers
+
+    for value in vars(serializers).values():
+        if (
+            isinstance(value, type)
+            and issubclass(value, BaseSerializer)
+            and value.__module__ == serializers.__name__
+        ):
+            value().fields
+
+
+def open_connections(keep: bool = False) -> None:
+    """Открывает соединения со всеми базами в текущем потоке.
+
+    Соединения Django принадлежат потоку, поэтому постоянное соединение
+    (`CONN_MAX_AGE`) остаётся открытым только при `keep` - когда запросы
+    выполняются в этом же потоке (sync-воркер gunicorn). Иначе оно
+    закрывается: пул (`DB_POOL=local`) получает его обратно и выдаст
+    любому потоку, а без пула шаг только проверяет доступность базы.
+
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+        if not keep or not connection.settings_dict['CONN_MAX_AGE']:
+            connection.close()
+
+
+def load_reference_data() -> None:
+    """Читает теги и ингредиенты, поднимая их страницы в кеш базы."""
+    from recipes.models import Ingredient, Tag
+
+    list(Tag.objects.values_list('id', 'slug'))
+    list(Ingredient.objects.values_list('id', 'name', 'unit__name'))
+
+
+STEPS = (
+    compile_routes,
+    build_serializers,
+    open_connections,
+    load_reference_data,
+)
+
+
+def run() -> bool:
+    """Прогревает процесс, если это ещё не сделано.
+
+    Returns:
+        bool: Готов ли процесс. `False`, если база недоступна, - прогрев
+        повторится при следующем вызове.
+
+    """
+    with _lock:
+        if _ready.is_set():
+            return True
+        timings = {}
+        try:
+            for step in STEPS:
+                started = perf_counter()
+                step()
+                timings[f'{step.__name__}_ms'] = round(
+                    (perf_counter() - started) * 1000,
+                    1,
+                )
+        except DatabaseError:
+            logger.warning('Прогрев не завершён: база недоступна.')
+            return False
+        _ready.set()
+    logger.info(json.dumps({'warmup': timings}))
+    return True
+
+
+def is_ready() -> bool:
+    return not settings.WARMUP or _ready.is_set()
+
+
+def ready_view(request: HttpRequest) -> JsonResponse:
+    """Готовность процесса к запросам: 200 после прогрева, иначе 503.
+
+    Если прогрев не удался при запуске, проба повторяет его.
+
+    """
+    ready = is_ready() or run()
+    return JsonResponse({'ready': ready}, status=200 if ready else 503)
@@ -0,0 +1,138 @@
+"""Настройки gunicorn, файл подхватывается из рабочего каталога.
+
+Все параметры задаются переменными окружения `GUNICORN_*`, значения по
+умолчанию рассчитаны от числа доступных процессоров:
+
+- `sync` - один запрос на процесс, `2 * CPU + 1` процессов. Подходит,
+  когда перед gunicorn стоит nginx, буферизующий медленных клиентов.
+- `gthread` (по умолчанию) - `CPU + 1` процессов по `GUNICORN_THREADS`
+  потоков. Пока один поток ждёт базу или пишет изображение, другие
+  обслуживают запросы, памяти нужно меньше, чем на те же потоки
+  процессами.
+- `uvicorn.workers.UvicornWorker` - ASGI (`backend.asgi`), асинхронные
+  представления для чтения, по процессу на CPU.
+
+Замер на своей машине: `python manage.py load_test --worker-class ...`.
+"""
+
+import math
+import os
+import shutil
+from pathlib import Path
+
+
+def cpu_count() -> int:
+    """Процессоры, доступные процессу, с учётом квоты cgroup контейнера."""
+    count = len(os.sched_getaffinity(0))
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+    except (OSError, ValueError):
+        return count
+    if quota == 'max':
+        return count
+    return max(min(count, math.ceil(int(quota) / int(period))), 1)
+
+
+cpus = cpu_count()
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default='gthread')
+asgi = 'uvicorn' in worker_class
+
+wsgi_app = 'backend.asgi:application' if asgi else 'backend.wsgi:application'
+bind = os.getenv('GUNICORN_BIND', default='0.0.0.0:8000')
+if asgi:
+    workers = cpus
+elif worker_class == 'gthread':
+    workers = cpus + 1
+else:
+    workers = 2 * cpus + 1
+workers = int(os.getenv('GUNICORN_WORKERS', default=workers))
+threads = int(
+    os.getenv(
+        'GUNICORN_THREADS',
+        default=4 if worker_class == 'gthread' else 1,
+    ),
+)
+# Соединения с базой: каждый поток держит своё, поэтому на хост их до
+# `workers * threads` (и столько же с репликой, под ASGI - по соединению
+# на выполняемый запрос). Сумма по всем хостам должна оставаться ниже
+# `max_connections` PostgreSQL (100 по умолчанию) с запасом для миграций
+# и администрирования, при большем числе - `DB_POOL=pgbouncer`. Пул
+# процесса (`DB_POOL=local`) хранит не больше соединений, чем потоков:
+# свободных соединений больше не бывает.
+db_connections = workers * threads
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+# Загрузка приложения в мастере: воркеры стартуют быстрее и делят
+# память с мастером, пока не изменят её.
+preload_app = os.getenv('GUNICORN_PRELOAD', default='1') == '1'
+# Перезапуск воркера после стольких запросов ограничивает рост памяти,
+# разброс не даёт всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default='1000'))
+max_requests_jitter = int(
+    os.getenv('GUNICORN_MAX_REQUESTS_JITTER', default=max_requests // 10),
+)
+# Создание рецепта с изображением на медленном диске может идти дольше
+# стандартных 30 секунд.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default='60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', default='30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default='5'))
+# Файл для проверки живости воркеров: в Docker файловая система слоёв
+# может подвешивать запись, память - нет.
+if Path('/dev/shm').is_dir():
+    worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server) -> None:
+    """Очищает файлы метрик Prometheus от прошлого запуска."""
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        Path(path).mkdir(parents=True)
+
+
+def when_ready(server) -> None:
+    """Сообщает верхнюю границу соединений с базой от этого хоста."""
+    server.log.info(
+        'Соединений с базой: до %s (%s воркеров x %s потоков)',
+        db_connections,
+        workers,
+        threads,
+    )
+
+
+def pre_fork(server, worker) -> None:
+    """Закрывает соединения с базой, открытые мастером при preload.
+
+    Воркер унаследовал бы сокет соединения, и два процесса писали бы
+    в одно соединение.
+
+    """
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker) -> None:
+    """Открывает соединения воркера с базой до первого запроса.
+
+    Остальной прогрев (`core.warmup`) при preload выполнен в мастере.
+    Постоянное соединение оставляет открытым только sync-воркер: хук
+    выполняется в главном потоке, а запросы gthread и ASGI идут в других
+    потоках со своими соединениями, открытое здесь простаивало бы.
+
+    """
+    from django.conf import settings
+    from gunicorn.workers.sync import SyncWorker
+
+    from core import warmup
+
+    if settings.WARMUP and warmup.run():
+        warmup.open_connections(keep=isinstance(worker, SyncWorker))
+
+
+def child_exit(server, worker) -> None:
+    """Отмечает завершившийся воркер в метриках Prometheus."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
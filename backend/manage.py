@@ -1,12 +1,31 @@
 #!/usr/bin/env python
 """Django's command-line utility for administrative tasks."""
+
 import os
 import sys
 
+# Команды без HTTP: запускаются с облегчёнными настройками
+# (backend/settings_lean.py), если настройки не заданы явно.
+LEAN_COMMANDS = {
+    "csv_to_base",
+    "export_recipes",
+    "import_recipes",
+    "load_ingredients",
+    "rebuild_cart_totals",
+    "slow_queries",
+}
+
 
 def main():
     """Run administrative tasks."""
+    if sys.argv[1:2] and sys.argv[1] in LEAN_COMMANDS:
+        os.environ.setdefault(
+            "DJANGO_SETTINGS_MODULE",
+            "backend.settings_lean",
+        )
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    # Командам прогрев воркера (core/warmup.py) не нужен.
+    os.environ.setdefault("WARMUP", "0")
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -1,4 +1,7 @@
 from django.contrib.admin import ModelAdmin, TabularInline, display, register
+from django.db import transaction
+from django.db.models import QuerySet
+from django.forms import ModelForm
 from django.http import HttpRequest
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
@@ -7,15 +10,26 @@ from recipes.forms import TagForm
 from recipes.models import (
     AmountIngredient,
     Cart,
+    CartTotal,
     Favorite,
     Ingredient,
     Recipe,
     Tag,
+    Unit,
 )
 
 EMPTY_VALUE_DISPLAY = 'Значение не указано'
 
 
+def cart_users(recipes: QuerySet | list[Recipe]) -> list[int]:
+    """`id` пользователей, у которых рецепты из `recipes` в корзине."""
+    return list(
+        Cart.objects.filter(recipe__in=recipes)
+        .values_list('user_id', flat=True)
+        .distinct(),
+    )
+
+
 class IngredientInline(TabularInline):
     model = AmountIngredient
     extra = 2
@@ -23,17 +37,69 @@ class IngredientInline(TabularInline):
 
 @register(AmountIngredient)
 class AmountAdmin(ModelAdmin):
-    pass
+    """Состав рецептов.
+
+    Изменения пересчитывают итоги корзин (`CartTotal`) пользователей,
+    у которых затронутые рецепты в корзине.
+
+    """
+
+    @transaction.atomic
+    def save_model(
+        self,
+        request: HttpRequest,
+        obj: AmountIngredient,
+        form: ModelForm,
+        change: bool,
+    ) -> None:
+        recipes = [obj.recipe_id]
+        if change and 'recipe' in form.changed_data:
+            recipes.append(form.initial['recipe'])
+        super().save_model(request, obj, form, change)
+        CartTotal.objects.rebuild(cart_users(recipes))
+
+    @transaction.atomic
+    def delete_model(
+        self,
+        request: HttpRequest,
+        obj: AmountIngredient,
+    ) -> None:
+        users = cart_users([obj.recipe_id])
+        super().delete_model(request, obj)
+        CartTotal.objects.rebuild(users)
+
+    @transaction.atomic
+    def delete_queryset(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet,
+    ) -> None:
+        users = cart_users(queryset.values('recipe'))
+        super().delete_queryset(request, queryset)
+        CartTotal.objects.rebuild(users)
+
+
+@register(Unit)
+class UnitAdmin(ModelAdmin):
+    list_display = (
+        'name',
+        'dimension',
+        'factor',
+        'is_display',
+    )
+    search_fields = ('name',)
+    list_filter = ('dimension', 'is_display')
 
 
 @register(Ingredient)
 class IngredientAdmin(ModelAdmin):
     list_display = (
         'name',
-        'measurement_unit',
+        'unit',
     )
+    list_select_related = ('unit',)
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('unit',)
 
     empty_value_display = EMPTY_VALUE_DISPLAY
 
@@ -70,6 +136,32 @@ class RecipeAdmin(ModelAdmin):
     save_on_top = True
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    def save_related(
+        self,
+        request: HttpRequest,
+        form: ModelForm,
+        formsets: list,
+        change: bool,
+    ) -> None:
+        """Сохраняет состав рецепта и обновляет итоги корзин с рецептом."""
+        recipe = form.instance
+        users = cart_users([recipe]) if change else []
+        with transaction.atomic():
+            CartTotal.objects.apply_recipe(recipe, users, sign=-1)
+            super().save_related(request, form, formsets, change)
+            CartTotal.objects.apply_recipe(recipe, users)
+
+    @transaction.atomic
+    def delete_queryset(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet,
+    ) -> None:
+        """Массовое удаление обходит `Recipe.delete`: итоги пересчитываются."""
+        users = cart_users(queryset)
+        super().delete_queryset(request, queryset)
+        CartTotal.objects.rebuild(users)
+
     def get_image(self, obj: Recipe):
         return mark_safe(f"<img src={obj.image.url} width='80' hieght='30'")
 
@@ -126,3 +218,14 @@ class FavoriteAdmin(ModelAdmin):
 class CardAdmin(ModelAdmin):
     list_display = ('user', 'recipe', 'date_added')
     search_fields = ('user__username', 'recipe__name')
+
+    @transaction.atomic
+    def delete_queryset(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet,
+    ) -> None:
+        """Массовое удаление обходит `Cart.delete`: итоги пересчитываются."""
+        users = list(queryset.values_list('user_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        CartTotal.objects.rebuild(users)
@@ -0,0 +1,361 @@
+"""Потоковый экспорт и импорт рецептов в формате JSON Lines.
+
+Каждая строка файла - один рецепт со всеми связями: тегами,
+количествами ингредиентов, автором, избранным и списками покупок.
+Пользователи ссылаются по email, теги - по slug, ингредиенты - по
+названию и единице измерения, поэтому файл можно загрузить в базу
+с другими первичными ключами.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (
+    AmountIngredient,
+    Cart,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+    Unit,
+)
+
+User = get_user_model()
+
+
+def export_queryset() -> QuerySet[Recipe]:
+    """Рецепты со всеми связями, нужными для экспорта."""
+    return (
+        Recipe.objects.select_related('author')
+        .prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipes',
+                queryset=AmountIngredient.objects.select_related(
+                    'ingredients__unit',
+                ),
+            ),
+            Prefetch(
+                'in_favorites',
+                queryset=Favorite.objects.select_related('user'),
+            ),
+            Prefetch(
+                'shopping_cart',
+                queryset=Cart.objects.select_related('user'),
+            ),
+        )
+        .order_by('id')
+    )
+
+
+def recipe_to_record(recipe: Recipe) -> dict:
+    """Сериализует рецепт с предзагруженными связями в словарь."""
+    author = recipe.author
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'author': author
+        and {'email': author.email, 'username': author.username},
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.unit.name,
+                'amount': amount.amount,
+            }
+            for amount in recipe.ingredientrecipes.all()
+        ],
+        'favorited_by': [
+            favorite.user.email for favorite in recipe.in_favorites.all()
+        ],
+        'in_shopping_cart_of': [
+            cart.user.email for cart in recipe.shopping_cart.all()
+        ],
+    }
+
+
+def export_recipes(output: IO[str], chunk_size: int) -> Iterator[int]:
+    """Пишет рецепты в `output` построчно.
+
+    Yields:
+        int: Количество выгруженных рецептов после каждой пачки.
+
+    """
+    count = 0
+    for recipe in export_queryset().iterator(chunk_size=chunk_size):
+        output.write(json.dumps(recipe_to_record(recipe), ensure_ascii=False))
+        output.write('\n')
+        count += 1
+        if not count % chunk_size:
+            yield count
+    yield count
+
+
+class Checkpoint:
+    """Номер последней загруженной строки для одного воркера импорта.
+
+    Хранится в отдельном файле на воркер и перезаписывается атомарно
+    после фиксации каждой пачки.
+
+    """
+
+    def __init__(self, path: Path | None, worker: int, workers: int) -> None:
+        self.path = path and Path(f'{path}.{worker}-of-{workers}')
+
+    def load(self) -> int:
+        if self.path is None or not self.path.is_file():
+            return 0
+        return int(self.path.read_text() or 0)
+
+    def save(self, line: int) -> None:
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(str(line))
+        os.replace(tmp, self.path)
+
+
+class MissingReferences(Exception):
+    """В пачке есть неизвестные авторы или теги, которые не создаются."""
+
+
+class RecipeImporter:
+    """Пакетная загрузка записей экспорта в базу.
+
+    Повторная загрузка рецепта с тем же названием и автором пропускается,
+    поэтому импорт можно безопасно продолжить с контрольной точки.
+    Итоги корзин (`CartTotal`) не обновляются: владельцы корзин копятся
+    в `cart_users`, их итоги пересчитываются после загрузки.
+    Справочники вставляются в отсортированном порядке, чтобы параллельные
+    воркеры блокировали строки в одной последовательности.
+
+    Автор, которого нет в базе (по email), и тег, который не создаётся
+    из-за совпадения названия или цвета с другим тегом, собираются
+    в `missing_authors` и `missing_tags`. Без `skip_missing` такая пачка
+    не загружается (`MissingReferences`), иначе рецепт загружается без
+    автора и без этих тегов.
+
+    """
+
+    def __init__(
+        self,
+        id_map: IO[str] | None = None,
+        skip_missing: bool = False,
+    ) -> None:
+        self.id_map = id_map
+        self.skip_missing = skip_missing
+        self.created = self.skipped = 0
+        self.cart_users = set()
+        self.missing_authors = set()
+        self.missing_tags = set()
+
+    def import_batch(self, records: list[dict]) -> None:
+        with transaction.atomic():
+            users = self._users(records)
+            tags = self._tags(records)
+            self._check_missing(records, users, tags)
+            ingredients = self._ingredients(records)
+            recipes = self._recipes(records, users)
+            self._relations(recipes, users, tags, ingredients)
+
+    def _users(self, records: list[dict]) -> dict[str, int]:
+        emails = set()
+        for record in records:
+            if record['author']:
+                emails.add(record['author']['email'])
+            emails.update(record['favorited_by'])
+            emails.update(record['in_shopping_cart_of'])
+        return dict(
+            User.objects.filter(email__in=emails).values_list('email', 'id'),
+        )
+
+    def _tags(self, records: list[dict]) -> dict[str, int]:
+        tags = {
+            tag['slug']: tag for record in records for tag in record['tags']
+        }
+        Tag.objects.bulk_create(
+            (Tag(**tags[slug]) for slug in sorted(tags)),
+            ignore_conflicts=True,
+        )
+        return dict(
+            Tag.objects.filter(slug__in=tags).values_list('slug', 'id'),
+        )
+
+    def _check_missing(
+        self,
+        records: list[dict],
+        users: dict[str, int],
+        tags: dict[str, int],
+    ) -> None:
+        authors = {
+            record['author']['email']
+            for record in records
+            if record['author'] and record['author']['email'] not in users
+        }
+        slugs = {
+            tag['slug']
+            for record in records
+            for tag in record['tags']
+            if tag['slug'] not in tags
+        }
+        if (authors or slugs) and not self.skip_missing:
+            raise MissingReferences(
+                f'Нет авторов: {", ".join(sorted(authors)) or "-"}; '
+                f'не созданы теги: {", ".join(sorted(slugs)) or "-"}',
+            )
+        self.missing_authors.update(authors)
+        self.missing_tags.update(slugs)
+
+    def _ingredients(self, records: list[dict]) -> dict[tuple, int]:
+        keys = {
+            (item['name'], item['measurement_unit'])
+            for record in records
+            for item in record['ingredients']
+        }
+        unit_names = {unit for _, unit in keys}
+        Unit.objects.bulk_create(
+            (Unit(name=name) for name in sorted(unit_names)),
+            ignore_conflicts=True,
+        )
+        units = dict(
+            Unit.objects.filter(name__in=unit_names).values_list('name', 'id'),
+        )
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, unit_id=units[unit])
+                for name, unit in sorted(keys)
+            ),
+            ignore_conflicts=True,
+        )
+        return {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in keys},
+            ).values_list('id', 'name', 'unit__name')
+        }
+
+    def _recipes(
+        self,
+        records: list[dict],
+        users: dict[str, int],
+    ) -> list[tuple[dict, int]]:
+        """Создаёт рецепты пачки и возвращает пары (запись, новый `id`)."""
+        existing = set(
+            Recipe.objects.filter(
+                name__in={record['name'] for record in records},
+            ).values_list('name', 'author_id'),
+        )
+        new = []
+        for record in records:
+            author = record['author']
+            author_id = author and users.get(author['email'])
+            if (record['name'], author_id) in existing:
+                # Загружен при прерванном запуске: итоги корзин
+                # его покупателей тоже нужно пересчитать.
+                self.skipped += 1
+                self.cart_users.update(
+                    users[email]
+                    for email in record['in_shopping_cart_of']
+                    if email in users
+                )
+                continue
+            existing.add((record['name'], author_id))
+            recipe = Recipe(
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                author_id=author_id,
+            )
+            new.append((record, recipe))
+
+        created = Recipe.objects.bulk_create(recipe for _, recipe in new)
+        for (record, _), recipe in zip(new, created):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        Recipe.objects.bulk_update(created, ('pub_date',))
+        self.created += len(created)
+
+        if self.id_map is not None:
+            for (record, _), recipe in zip(new, created):
+                self.id_map.write(
+                    json.dumps({'old': record['id'], 'new': recipe.id}) + '\n',
+                )
+        return [
+            (record, recipe.id) for (record, _), recipe in zip(new, created)
+        ]
+
+    def _relations(
+        self,
+        recipes: list[tuple[dict, int]],
+        users: dict[str, int],
+        tags: dict[str, int],
+        ingredients: dict[tuple, int],
+    ) -> None:
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe_id=recipe_id, tag_id=tags[tag['slug']])
+            for record, recipe_id in recipes
+            for tag in record['tags']
+            if tag['slug'] in tags
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe_id=recipe_id,
+                ingredients_id=ingredients[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount'],
+            )
+            for record, recipe_id in recipes
+            for item in record['ingredients']
+        )
+        Favorite.objects.bulk_create(
+            (
+                Favorite(recipe_id=recipe_id, user_id=users[email])
+                for record, recipe_id in recipes
+                for email in record['favorited_by']
+                if email in users
+            ),
+            ignore_conflicts=True,
+        )
+        carts = [
+            Cart(recipe_id=recipe_id, user_id=users[email])
+            for record, recipe_id in recipes
+            for email in record['in_shopping_cart_of']
+            if email in users
+        ]
+        Cart.objects.bulk_create(carts)
+        self.cart_users.update(cart.user_id for cart in carts)
+
+
+def iter_records(
+    file: IO[str],
+    worker: int = 0,
+    workers: int = 1,
+    start_line: int = 0,
+) -> Iterable[tuple[int, dict]]:
+    """Строки файла, принадлежащие воркеру `worker` из `workers`.
+
+    Строки распределяются по остатку от деления номера строки,
+    строки до `start_line` включительно пропускаются.
+
+    """
+    for line_no, line in enumerate(file, start=1):
+        if line_no <= start_line or line_no % workers != worker:
+            continue
+        if line.strip():
+            yield line_no, json.loads(line)
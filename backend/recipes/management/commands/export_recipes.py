@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management import BaseCommand
+
+from core.constants import Limits
+from recipes.backup import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка рецептов в JSON Lines (один рецепт в строке).'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            'output',
+            nargs='?',
+            default='-',
+            help='Файл для выгрузки, по умолчанию - stdout.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=Limits.BACKUP_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options) -> None:
+        chunk_size = max(options['chunk_size'], 1)
+        to_stdout = options['output'] == '-'
+        output = (
+            self.stdout
+            if to_stdout
+            else open(Path(options['output']), 'w', encoding='utf8')
+        )
+        try:
+            for count in export_recipes(output, chunk_size):
+                if options['verbosity'] and not to_stdout:
+                    self.stderr.write(f'Выгружено рецептов: {count}')
+        finally:
+            if not to_stdout:
+                output.close()
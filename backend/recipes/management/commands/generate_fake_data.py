@@ -0,0 +1,341 @@
+import random
+import time
+from itertools import accumulate
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image
+
+from core.constants import Additional, Limits
+from recipes.models import (
+    AmountIngredient,
+    Cart,
+    CartTotal,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+    Unit,
+)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+DEFAULT_TAGS = (
+    ('завтрак', '#E26C2D', 'breakfast'),
+    ('обед', '#49B64E', 'lunch'),
+    ('ужин', '#8775D2', 'dinner'),
+    ('десерт', '#F5A623', 'dessert'),
+    ('выпечка', '#D0021B', 'bakery'),
+)
+WORDS = (
+    'нарезать обжарить смешать добавить посолить варить запекать остудить '
+    'подавать минут до готовности на среднем огне и с мелко тонко перемешать'
+).split()
+
+
+def next_number(queryset) -> int:
+    """Первый номер для имён новых объектов.
+
+    Номер в имени созданного объекта меньше его `id`, поэтому имена от
+    наибольшего `id` не совпадают с уже созданными, даже после удалений.
+
+    """
+    return queryset.aggregate(Max('id'))['id__max'] or 0
+
+
+def power_law(size: int, exponent: float) -> list[float]:
+    """Накопленные веса распределения Ципфа для `random.choices`."""
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные для нагрузочного тестирования: '
+        'пользователей, рецепты, избранное, корзины и подписки.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=20,
+            help='Количество картинок-заглушек, общих для всех рецептов.',
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона популярности.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=Limits.FAKE_DATA_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--prefix',
+            default='fake',
+            help='Префикс имён создаваемых пользователей.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        self.rng = random.Random(options['seed'])
+        self.batch_size = max(options['batch_size'], 1)
+        self.exponent = options['exponent']
+        self.verbosity = options['verbosity']
+
+        # Порядок по естественному ключу, а не по id и не по правилам
+        # сортировки СУБД: одинаковый результат на SQLite и PostgreSQL.
+        self.ingredients = [
+            (pk, dimension)
+            for *_, pk, dimension in sorted(
+                Ingredient.objects.values_list(
+                    'name',
+                    'unit__name',
+                    'id',
+                    'unit__dimension',
+                ),
+            )
+        ]
+        if not self.ingredients:
+            raise CommandError(
+                'Справочник ингредиентов пуст, выполните load_ingredients.',
+            )
+        # Популярность ингредиентов: случайный, но воспроизводимый порядок.
+        self.rng.shuffle(self.ingredients)
+        self.tags = self._tags()
+        self.images = self._images(max(options['images'], 1))
+
+        users = self._users(options['users'], options['prefix'])
+        if not users:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        # Немногие авторы пишут большинство рецептов.
+        authors = users[:]
+        self.rng.shuffle(authors)
+        recipes = self._recipes(options['recipes'], authors)
+
+        popular = recipes[:]
+        self.rng.shuffle(popular)
+        self._pairs(
+            Favorite,
+            'recipe_id',
+            popular,
+            users,
+            options['favorites'],
+        )
+        self._pairs(Cart, 'recipe_id', popular, users, options['carts'])
+        self._pairs(
+            Subscriptions,
+            'author_id',
+            authors,
+            users,
+            options['subscriptions'],
+        )
+        if options['carts'] and recipes:
+            self._phase('итоги корзин', CartTotal.objects.rebuild)
+
+    def _phase(self, name: str, func, *args) -> list:
+        started = time.monotonic()
+        result = func(*args)
+        elapsed = time.monotonic() - started
+        if self.verbosity:
+            count = result if isinstance(result, int) else len(result)
+            self.stdout.write(
+                f'{name}: {count} строк за {elapsed:.1f} с '
+                f'({count / max(elapsed, 1e-6):.0f} строк/с)',
+            )
+        return result
+
+    def _bulk_create(self, model, rows) -> list:
+        """Создаёт объекты пачками, возвращает их `id`."""
+        ids = []
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                ids.extend(self._flush(model, batch))
+                batch = []
+        if batch:
+            ids.extend(self._flush(model, batch))
+        return ids
+
+    @staticmethod
+    def _flush(model, batch: list) -> list:
+        with transaction.atomic():
+            return [obj.pk for obj in model.objects.bulk_create(batch)]
+
+    def _tags(self) -> list[int]:
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            )
+        return [pk for _, pk in sorted(Tag.objects.values_list('slug', 'id'))]
+
+    def _images(self, count: int) -> list[str]:
+        folder = Path(settings.MEDIA_ROOT, 'fake')
+        folder.mkdir(parents=True, exist_ok=True)
+        names = []
+        for num in range(count):
+            name = f'fake/placeholder_{num}.png'
+            path = Path(settings.MEDIA_ROOT, name)
+            # Цвет выбирается всегда, чтобы последовательность случайных
+            # чисел не зависела от уже существующих файлов.
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            if not path.exists():
+                Image.new('RGB', Additional.RECIPE_IMAGE_SIZE, color).save(
+                    path,
+                )
+            names.append(name)
+        return names
+
+    def _users(self, count: int, prefix: str) -> list[int]:
+        offset = next_number(User.objects)
+        password = make_password(None)
+        rows = (
+            User(
+                username=f'{prefix}_{num}',
+                email=f'{prefix}_{num}@example.com',
+                first_name=f'Имя{num}',
+                last_name=f'Фамилия{num}',
+                password=password,
+            )
+            for num in range(offset, offset + count)
+        )
+        users = self._phase('пользователи', self._bulk_create, User, rows)
+        return users or list(
+            User.objects.order_by('id').values_list('id', flat=True),
+        )
+
+    def _recipes(self, count: int, authors: list[int]) -> list[int]:
+        author_weights = power_law(len(authors), self.exponent)
+        offset = next_number(Recipe.objects)
+        rows = (
+            Recipe(
+                name=f'Рецепт {num}',
+                author_id=author,
+                text=' '.join(
+                    self.rng.choices(WORDS, k=self.rng.randint(10, 60)),
+                ),
+                cooking_time=min(
+                    int(self.rng.lognormvariate(3.3, 0.6)) + 1,
+                    Limits.MAX_COOKING_TIME,
+                ),
+                image=self.rng.choice(self.images),
+            )
+            for num, author in enumerate(
+                self.rng.choices(authors, cum_weights=author_weights, k=count),
+                start=offset,
+            )
+        )
+        recipes = self._phase('рецепты', self._bulk_create, Recipe, rows)
+        self._phase('ингредиенты рецептов', self._amounts, recipes)
+        self._phase('теги рецептов', self._recipe_tags, recipes)
+        return recipes
+
+    def _amounts(self, recipes: list[int]) -> list[int]:
+        weights = power_law(len(self.ingredients), self.exponent)
+        max_count = min(Limits.MAX_AMOUNT_INGREDIENTS, len(self.ingredients))
+
+        def rows():
+            for recipe in recipes:
+                size = min(
+                    max(round(self.rng.gauss(7, 3)), 1),
+                    max_count,
+                )
+                chosen = {}
+                while len(chosen) < size:
+                    pk, dimension = self.rng.choices(
+                        self.ingredients,
+                        cum_weights=weights,
+                    )[0]
+                    chosen[pk] = dimension
+                for pk, dimension in chosen.items():
+                    if dimension == Unit.Dimension.COUNT:
+                        amount = self.rng.randint(1, 5)
+                    else:
+                        amount = self.rng.randint(1, 20) * 25
+                    yield AmountIngredient(
+                        recipe_id=recipe,
+                        ingredients_id=pk,
+                        amount=amount,
+                    )
+
+        return self._bulk_create(AmountIngredient, rows())
+
+    def _recipe_tags(self, recipes: list[int]) -> list[int]:
+        RecipeTag = Recipe.tags.through
+        weights = power_law(len(self.tags), 1)
+
+        def rows():
+            for recipe in recipes:
+                size = self.rng.choices((1, 2, 3), weights=(6, 3, 1))[0]
+                for tag in set(
+                    self.rng.choices(self.tags, cum_weights=weights, k=size),
+                ):
+                    yield RecipeTag(recipe_id=recipe, tag_id=tag)
+
+        return self._bulk_create(RecipeTag, rows())
+
+    def _pairs(
+        self,
+        model,
+        target_field: str,
+        targets: list[int],
+        users: list[int],
+        count: int,
+    ) -> None:
+        """Связи пользователь - объект со степенной популярностью объектов.
+
+        Повторяющиеся пары отбрасывает база (`ignore_conflicts`), подписки
+        на себя не создаются, поэтому строк может получиться меньше `count`.
+
+        """
+        if not targets or not count:
+            return
+        weights = power_law(len(targets), self.exponent)
+
+        def rows():
+            for _ in range(count):
+                user = self.rng.choice(users)
+                target = self.rng.choices(targets, cum_weights=weights)[0]
+                if target_field == 'author_id' and user == target:
+                    continue
+                yield model(user_id=user, **{target_field: target})
+
+        self._phase(
+            model._meta.verbose_name_plural,
+            self._bulk_create_ignore,
+            model,
+            rows(),
+        )
+
+    def _bulk_create_ignore(self, model, rows) -> int:
+        """Создаёт объекты пачками, возвращает число добавленных строк.
+
+        С `ignore_conflicts` база не сообщает, сколько строк пропущено,
+        поэтому добавленные считаются по числу строк до и после.
+
+        """
+        before = model.objects.count()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return model.objects.count() - before
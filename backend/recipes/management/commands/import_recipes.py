@@ -0,0 +1,179 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.constants import Limits
+from recipes.backup import (
+    Checkpoint,
+    MissingReferences,
+    RecipeImporter,
+    iter_records,
+)
+from recipes.models import CartTotal
+
+
+def import_part(
+    path: Path,
+    worker: int,
+    workers: int,
+    batch_size: int,
+    checkpoint: Path | None,
+    id_map: Path | None,
+    skip_missing: bool,
+) -> tuple[int, int, set[int], set[str], set[str], str | None]:
+    """Загружает строки файла, принадлежащие одному воркеру.
+
+    Returns:
+        Количество созданных и пропущенных (уже загруженных) рецептов,
+        `id` пользователей, в корзины которых добавлены рецепты,
+        email ненайденных авторов, slug несозданных тегов и ошибка
+        `MissingReferences`, на которой загрузка остановилась.
+
+    """
+    state = Checkpoint(checkpoint, worker, workers)
+    id_map_file = id_map and open(
+        f'{id_map}.{worker}-of-{workers}',
+        'a',
+        encoding='utf8',
+    )
+    importer = RecipeImporter(id_map_file, skip_missing)
+    failure = None
+    try:
+        with open(path, encoding='utf8') as file:
+            batch = []
+            for line_no, record in iter_records(
+                file,
+                worker,
+                workers,
+                state.load(),
+            ):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    importer.import_batch(batch)
+                    state.save(line_no)
+                    batch = []
+            if batch:
+                importer.import_batch(batch)
+                state.save(line_no)
+    except MissingReferences as error:
+        failure = str(error)
+    finally:
+        if id_map_file:
+            id_map_file.close()
+        connections.close_all()
+    return (
+        importer.created,
+        importer.skipped,
+        importer.cart_users,
+        importer.missing_authors,
+        importer.missing_tags,
+        failure,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пакетная загрузка рецептов из JSON Lines, созданного '
+        'командой export_recipes.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('input', help='Файл выгрузки.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=Limits.BACKUP_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество параллельных процессов (не для SQLite).',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Префикс файлов контрольных точек. При повторном запуске '
+                'с тем же числом воркеров импорт продолжится с них.'
+            ),
+        )
+        parser.add_argument(
+            '--id-map',
+            help='Префикс файлов соответствия старых и новых id рецептов.',
+        )
+        parser.add_argument(
+            '--skip-missing',
+            action='store_true',
+            help=(
+                'Загружать рецепты без авторов, которых нет в базе, '
+                'и без тегов, конфликтующих с существующими. '
+                'Без флага импорт на них останавливается.'
+            ),
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = Path(options['input'])
+        if not path.is_file():
+            raise CommandError(f'{path} not exist')
+        workers = max(options['workers'], 1)
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write('SQLite не поддерживает параллельную запись.')
+            workers = 1
+        args = (
+            path,
+            max(options['batch_size'], 1),
+            options['checkpoint'] and Path(options['checkpoint']),
+            options['id_map'] and Path(options['id_map']),
+            options['skip_missing'],
+        )
+
+        if workers == 1:
+            results = [import_part(path, 0, 1, *args[1:])]
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        import_part,
+                        path,
+                        worker,
+                        workers,
+                        *args[1:],
+                    )
+                    for worker in range(workers)
+                ]
+                results = [future.result() for future in futures]
+
+        created = sum(result[0] for result in results)
+        skipped = sum(result[1] for result in results)
+        cart_users = set().union(*(result[2] for result in results))
+        missing_authors = set().union(*(result[3] for result in results))
+        missing_tags = set().union(*(result[4] for result in results))
+        if cart_users:
+            CartTotal.objects.rebuild(cart_users)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Загружено рецептов: {created}, пропущено: {skipped}.',
+            ),
+        )
+        if missing_authors or missing_tags:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Не найдено авторов: {len(missing_authors)}, '
+                    f'не создано тегов: {len(missing_tags)}.',
+                ),
+            )
+        failures = [result[5] for result in results if result[5]]
+        if failures:
+            raise CommandError(
+                '\n'.join(failures)
+                + '\nЗагруженные пачки сохранены. Чтобы загрузить рецепты '
+                'без этих авторов и тегов, запустите команду с той же '
+                'контрольной точкой и --skip-missing.',
+            )
@@ -0,0 +1,371 @@
+import csv
+import io
+import json
+import time
+from pathlib import Path
+from typing import IO, Iterator
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import tracing
+from core.constants import Limits
+from recipes.models import AmountIngredient, Ingredient, Unit
+
+REJECT_HEADER = ('line', 'name', 'measurement_unit', 'reason', 'raw')
+
+
+def path_become(file_name: str) -> Path:
+    """Путь к файлу данных: как указан или внутри `CSV_DATA_DIR`."""
+    path = Path(file_name)
+    if path.is_file():
+        return path
+    return Path(settings.CSV_DATA_DIR, file_name)
+
+
+def iter_csv(file: IO[str]) -> Iterator[tuple[int, list]]:
+    """Построчно читает CSV вида `name,measurement_unit`."""
+    reader = csv.reader(file, delimiter=',', quotechar='"')
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_json(
+    file: IO[str],
+    chunk_size: int = 64 * 1024,
+) -> Iterator[tuple[int, list]]:
+    """Потоково читает JSON-массив или JSON Lines с объектами ингредиентов.
+
+    Файл читается частями по `chunk_size` символов, в памяти держится
+    только недочитанный остаток.
+
+    Raises:
+        CommandError: Файл не является корректным JSON.
+
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if buffer.startswith('['):
+        buffer = buffer[1:]
+    eof = False
+    num = 0
+    while True:
+        buffer = buffer.lstrip().removeprefix(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            if eof:
+                if buffer:
+                    raise CommandError(
+                        f'Некорректный JSON после объекта {num}: {error}',
+                    )
+                return
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        num += 1
+        buffer = buffer[end:]
+        if isinstance(obj, dict):
+            yield num, [obj.get('name'), obj.get('measurement_unit')]
+        else:
+            yield num, obj
+
+
+def validate_row(row: list) -> tuple[tuple[str, str] | None, str]:
+    """Проверяет и нормализует строку источника.
+
+    Returns:
+        Кортеж `(name, unit)` и пустая строка либо `None` и причина отказа.
+
+    """
+    if not isinstance(row, list) or len(row) != 2:
+        return None, 'ожидается два поля: name, measurement_unit'
+    name, unit = (
+        value.strip().lower() if isinstance(value, str) else ''
+        for value in row
+    )
+    if not name:
+        return None, 'не указано название'
+    if not unit:
+        return None, 'не указана единица измерения'
+    if len(name) > Limits.MAX_LEN_RECIPES_CHARFIELD:
+        return None, 'слишком длинное название'
+    if len(unit) > Unit._meta.get_field('name').max_length:
+        return None, 'слишком длинная единица измерения'
+    return (name, unit), ''
+
+
+def reject_record(num: int, row, reason: str) -> tuple:
+    """Строка файла отклонённых строк по колонкам `REJECT_HEADER`.
+
+    Первые два поля строки пишутся в `name` и `measurement_unit`,
+    лишние поля или значение, которое не является списком (элемент
+    JSON вроде `42`), - в `raw` в виде JSON.
+
+    """
+    if not isinstance(row, list):
+        return num, None, None, reason, json.dumps(row, ensure_ascii=False)
+    name, unit = (row + [None, None])[:2]
+    raw = json.dumps(row[2:], ensure_ascii=False) if row[2:] else ''
+    return num, name, unit, reason, raw
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая загрузка ингредиентов из CSV или JSON. '
+        'На PostgreSQL использует COPY и INSERT ... ON CONFLICT.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            'file',
+            nargs='?',
+            default='ingredients.json',
+            help='Файл с данными (по умолчанию ingredients.json).',
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            help='Формат файла. По умолчанию - по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=Limits.INGREDIENTS_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Файл для отклонённых строк (по умолчанию <file>.rejects.csv).',
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help=(
+                'Удалить ингредиенты, которых нет в источнике. '
+                'Ингредиенты, используемые в рецептах, сохраняются.'
+            ),
+        )
+        parser.add_argument(
+            '--trace',
+            action='store_true',
+            help='Записать трассу загрузки в TRACING_DIR.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not (options['trace'] or tracing.sampled()):
+            return self._handle(options)
+        command = type(self).__module__.rpartition('.')[2]
+        with tracing.trace(
+            command,
+            file=options['file'],
+            batch_size=options['batch_size'],
+        ), connection.execute_wrapper(tracing.query_span):
+            self._handle(options)
+
+    def _handle(self, options: dict) -> None:
+        path = path_become(options['file'])
+        if not path.is_file():
+            raise FileNotFoundError(f'{path} not exist')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'json', 'jsonl'):
+            raise CommandError(f'Неизвестный формат файла: {path.name}')
+        rejects_path = Path(
+            options['rejects'] or path.with_name(f'{path.stem}.rejects.csv'),
+        )
+
+        self.verbosity = options['verbosity']
+        self.batch_size = max(options['batch_size'], 1)
+        self.use_copy = connection.vendor == 'postgresql'
+        self.seen = set()
+        self.sync = options['sync']
+        self.created = self.read = self.rejected = 0
+        self.started = time.monotonic()
+
+        if self.use_copy:
+            self._create_staging()
+        try:
+            with open(path, encoding='utf8') as source, open(
+                rejects_path,
+                'w',
+                encoding='utf8',
+                newline='',
+            ) as rejects_file:
+                rejects = csv.writer(rejects_file)
+                rejects.writerow(REJECT_HEADER)
+                rows = (
+                    iter_csv(source)
+                    if file_format == 'csv'
+                    else iter_json(source)
+                )
+                self._load(rows, rejects)
+            deleted = self._sync() if self.sync else 0
+        finally:
+            if self.use_copy:
+                self._drop_staging()
+
+        if not self.rejected:
+            rejects_path.unlink()
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Готово за {elapsed:.1f} с: прочитано {self.read}, '
+                f'добавлено {self.created}, отклонено {self.rejected}, '
+                f'удалено {deleted}.',
+            ),
+        )
+        if self.rejected:
+            self.stdout.write(f'Отклонённые строки: {rejects_path}')
+
+    def _load(self, rows: Iterator[tuple[int, list]], rejects) -> None:
+        batch = {}
+        for num, row in rows:
+            self.read += 1
+            key, reason = validate_row(row)
+            if key is None:
+                self.rejected += 1
+                rejects.writerow(reject_record(num, row, reason))
+                continue
+            batch[key] = num
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: dict[tuple[str, str], int]) -> None:
+        with tracing.span('batch', rows=len(batch)), transaction.atomic():
+            if self.use_copy:
+                self.created += self._copy_batch(batch)
+            else:
+                self.created += self._orm_batch(batch)
+        if self.sync and not self.use_copy:
+            self.seen.update(batch)
+        if self.verbosity:
+            elapsed = time.monotonic() - self.started
+            self.stdout.write(
+                f'Обработано {self.read} строк '
+                f'({self.read / elapsed:.0f} строк/с), '
+                f'добавлено {self.created}',
+            )
+
+    def _orm_batch(self, batch: dict[tuple[str, str], int]) -> int:
+        """Пакетная загрузка через ORM (SQLite и другие СУБД)."""
+        unit_names = {unit for _, unit in batch}
+        Unit.objects.bulk_create(
+            (Unit(name=name) for name in unit_names),
+            ignore_conflicts=True,
+        )
+        units = dict(
+            Unit.objects.filter(name__in=unit_names).values_list('name', 'id'),
+        )
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in batch},
+            ).values_list('name', 'unit_id'),
+        )
+        new = [
+            Ingredient(name=name, unit_id=units[unit])
+            for name, unit in batch
+            if (name, units[unit]) not in existing
+        ]
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new)
+
+    def _create_staging(self) -> None:
+        with connection.cursor() as cursor:
+            for table in ('ingredient_batch', 'ingredient_seen'):
+                cursor.execute(
+                    f'CREATE TEMP TABLE {table} '
+                    '(name varchar(%s), unit varchar(%s))',
+                    (
+                        Limits.MAX_LEN_RECIPES_CHARFIELD,
+                        Unit._meta.get_field('name').max_length,
+                    ),
+                )
+
+    def _drop_staging(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DROP TABLE IF EXISTS ingredient_batch, ingredient_seen',
+            )
+
+    def _copy_batch(self, batch: dict[tuple[str, str], int]) -> int:
+        """Пакетная загрузка через `COPY` и `INSERT ... ON CONFLICT`."""
+        data = io.StringIO()
+        csv.writer(data).writerows(batch)
+        data.seek(0)
+        unit_table = Unit._meta.db_table
+        ingredient_table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE ingredient_batch')
+            copy_sql = (
+                'COPY ingredient_batch (name, unit) FROM STDIN '
+                'WITH (FORMAT csv)'
+            )
+            if hasattr(cursor.cursor, 'copy_expert'):
+                cursor.cursor.copy_expert(copy_sql, data)
+            else:
+                with cursor.cursor.copy(copy_sql) as copy:
+                    copy.write(data.getvalue())
+            cursor.execute(
+                f'INSERT INTO {unit_table} '
+                '(name, dimension, factor, is_display) '
+                'SELECT DISTINCT unit, %s, 1, false FROM ingredient_batch '
+                'ON CONFLICT (name) DO NOTHING',
+                (Unit.Dimension.COUNT,),
+            )
+            cursor.execute(
+                f'INSERT INTO {ingredient_table} (name, unit_id) '
+                'SELECT DISTINCT b.name, u.id FROM ingredient_batch b '
+                f'JOIN {unit_table} u ON u.name = b.unit '
+                'ON CONFLICT (name, unit_id) DO NOTHING',
+            )
+            created = cursor.rowcount
+            if self.sync:
+                cursor.execute(
+                    'INSERT INTO ingredient_seen SELECT * FROM ingredient_batch',
+                )
+        return created
+
+    def _sync(self) -> int:
+        """Удаляет ингредиенты, отсутствующие в источнике."""
+        if self.use_copy:
+            ingredient_table = Ingredient._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {ingredient_table} i '
+                    'WHERE NOT EXISTS ('
+                    '    SELECT 1 FROM ingredient_seen s '
+                    f'   JOIN {Unit._meta.db_table} u ON u.name = s.unit '
+                    '    WHERE s.name = i.name AND u.id = i.unit_id'
+                    ') AND NOT EXISTS ('
+                    f'   SELECT 1 FROM {AmountIngredient._meta.db_table} a '
+                    '    WHERE a.ingredients_id = i.id'
+                    ')',
+                )
+                return cursor.rowcount
+
+        unused = Ingredient.objects.filter(ingredientrecipes__isnull=True)
+        missing = [
+            pk
+            for pk, name, unit in unused.values_list(
+                'id',
+                'name',
+                'unit__name',
+            ).iterator(chunk_size=self.batch_size)
+            if (name, unit) not in self.seen
+        ]
+        deleted = 0
+        for start in range(0, len(missing), self.batch_size):
+            deleted += (
+                Ingredient.objects.filter(
+                    id__in=missing[start : start + self.batch_size],
+                )
+                .delete()[1]
+                .get(Ingredient._meta.label, 0)
+            )
+        return deleted
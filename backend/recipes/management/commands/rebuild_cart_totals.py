@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from recipes.models import CartTotal
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги списков покупок (CartTotal).'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='id пользователей, итоги которых нужно пересчитать.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        created = CartTotal.objects.rebuild(options['user_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано строк итогов: {created}'),
+        )
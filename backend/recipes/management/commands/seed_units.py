@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Unit
+from recipes.units import seed_units
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт известные единицы измерения (г, кг, мл, л и др.) '
+        'и их перевод в базовые единицы.'
+    )
+
+    def handle(self, *args, **options) -> None:
+        seeded = seed_units(Unit)
+        self.stdout.write(
+            self.style.SUCCESS(f'Известных единиц измерения: {seeded}'),
+        )
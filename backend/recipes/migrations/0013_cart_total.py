@@ -0,0 +1,90 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_cart_totals(apps, schema_editor):
+    AmountIngredient = apps.get_model("recipes", "AmountIngredient")
+    CartTotal = apps.get_model("recipes", "CartTotal")
+    amounts = (
+        AmountIngredient.objects.filter(recipe__shopping_cart__isnull=False)
+        .values(
+            "ingredients_id", user_id=models.F("recipe__shopping_cart__user")
+        )
+        .annotate(total=models.Sum("amount"))
+    )
+    CartTotal.objects.bulk_create(
+        (
+            CartTotal(
+                user_id=row["user_id"],
+                ingredient_id=row["ingredients_id"],
+                amount=row["total"],
+            )
+            for row in amounts.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0012_alter_recipe_cooking_time_alter_recipe_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество"
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_totals",
+                        to="recipes.ingredient",
+                        verbose_name="ингредиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_totals",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="владелец списка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "ингредиент в списке покупок",
+                "verbose_name_plural": "итоги списков покупок",
+                "ordering": ("ingredient__name",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="carttotal",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="recipes_carttotal ингредиент уже в итогах",
+            ),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
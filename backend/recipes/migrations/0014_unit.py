@@ -0,0 +1,168 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:30
+
+from decimal import Decimal
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+# name: (dimension, factor, is_display). Копия на момент миграции:
+# recipes/units.py может меняться, а миграция - нет.
+KNOWN_UNITS = {
+    "г": ("mass", Decimal(1), True),
+    "кг": ("mass", Decimal(1000), True),
+    "мл": ("volume", Decimal(1), True),
+    "л": ("volume", Decimal(1000), True),
+    "стакан": ("volume", Decimal(200), False),
+    "ст. л.": ("volume", Decimal(15), False),
+    "ч. л.": ("volume", Decimal(5), False),
+    "капля": ("volume", Decimal("0.05"), False),
+}
+
+
+def normalize_units(apps, schema_editor):
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    Unit = apps.get_model("recipes", "Unit")
+    Unit.objects.bulk_create(
+        Unit(
+            name=name,
+            dimension=dimension,
+            factor=factor,
+            is_display=is_display,
+        )
+        for name, (dimension, factor, is_display) in KNOWN_UNITS.items()
+    )
+    names = set(Ingredient.objects.values_list("measurement_unit", flat=True))
+    for name in names:
+        unit, _ = Unit.objects.get_or_create(name=name)
+        Ingredient.objects.filter(measurement_unit=name).update(unit=unit)
+
+
+def denormalize_units(apps, schema_editor):
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    Unit = apps.get_model("recipes", "Unit")
+    for unit in Unit.objects.all():
+        Ingredient.objects.filter(unit=unit).update(measurement_unit=unit.name)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0013_cart_total"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Unit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=24,
+                        unique=True,
+                        verbose_name="единица измерения",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("mass", "масса"),
+                            ("volume", "объём"),
+                            ("count", "штучные"),
+                        ],
+                        default="count",
+                        max_length=16,
+                        verbose_name="величина",
+                    ),
+                ),
+                (
+                    "factor",
+                    models.DecimalField(
+                        decimal_places=3,
+                        default=Decimal("1"),
+                        max_digits=12,
+                        validators=[
+                            django.core.validators.MinValueValidator(
+                                Decimal("0.001")
+                            )
+                        ],
+                        verbose_name="базовых единиц в единице",
+                    ),
+                ),
+                (
+                    "is_display",
+                    models.BooleanField(
+                        default=False, verbose_name="для вывода сумм"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "единица измерения",
+                "verbose_name_plural": "единицы измерения",
+                "ordering": ("name",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="unit",
+            constraint=models.CheckConstraint(
+                check=models.Q(("name__length__gt", 0)),
+                name="recipes_unit_name пусто",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="unit",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="ingredients",
+                to="recipes.unit",
+                verbose_name="единицы измерения",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ingredient",
+            name="measurement_unit",
+            field=models.CharField(
+                max_length=24, null=True, verbose_name="единицы измерения"
+            ),
+        ),
+        migrations.RunPython(normalize_units, denormalize_units),
+        migrations.RemoveConstraint(
+            model_name="ingredient",
+            name="unique_for_ingredient",
+        ),
+        migrations.RemoveConstraint(
+            model_name="ingredient",
+            name="recipes_ingredient_measurement_unit пусто",
+        ),
+        migrations.RemoveField(
+            model_name="ingredient",
+            name="measurement_unit",
+        ),
+        migrations.AlterField(
+            model_name="ingredient",
+            name="unit",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="ingredients",
+                to="recipes.unit",
+                verbose_name="единицы измерения",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "unit"), name="unique_for_ingredient"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.1 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0014_unit"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=models.ImageField(
+                upload_to="", verbose_name="изображение блюда"
+            ),
+        ),
+    ]
@@ -1,21 +1,100 @@
+from decimal import Decimal
+from itertools import islice
+from typing import Iterable
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import (
+    Case,
     CheckConstraint,
+    Exists,
+    F,
+    OuterRef,
     PositiveSmallIntegerField,
+    Prefetch,
     Q,
+    Sum,
     UniqueConstraint,
+    Value,
+    When,
 )
-from PIL import Image
+from django.db.models.functions import Greatest
 
 from backend.settings import NAME_MAX_LENGTH
 from core.constants import Additional, Limits
+from core.metrics import IMAGE_PROCESSING
+from core.timing import phase
+from core.tracing import span
 from core.validators import color_validator
 
 User = get_user_model()
 
 
+class Unit(models.Model):
+    """Единица измерения ингредиентов.
+
+    Attributes:
+        name:
+            Обозначение единицы (г, кг, ст. л. и т.п.).
+        dimension:
+            Величина, которую измеряет единица. Количества единиц
+            одной величины (кроме штучных) можно складывать между собой.
+        factor:
+            Сколько базовых единиц величины (г для массы, мл для объёма)
+            содержится в одной единице.
+        is_display:
+            Единица используется для вывода сумм в списке покупок.
+
+    """
+
+    class Dimension(models.TextChoices):
+        MASS = 'mass', 'масса'
+        VOLUME = 'volume', 'объём'
+        COUNT = 'count', 'штучные'
+
+    name = models.CharField(
+        verbose_name='единица измерения',
+        max_length=24,
+        unique=True,
+    )
+    dimension = models.CharField(
+        verbose_name='величина',
+        max_length=16,
+        choices=Dimension.choices,
+        default=Dimension.COUNT,
+    )
+    factor = models.DecimalField(
+        verbose_name='базовых единиц в единице',
+        max_digits=12,
+        decimal_places=3,
+        default=Decimal(1),
+        validators=(MinValueValidator(Decimal('0.001')),),
+    )
+    is_display = models.BooleanField(
+        verbose_name='для вывода сумм',
+        default=False,
+    )
+
+    class Meta:
+        verbose_name = 'единица измерения'
+        verbose_name_plural = 'единицы измерения'
+        ordering = ('name',)
+        constraints = (
+            CheckConstraint(
+                check=Q(name__length__gt=0),
+                name='%(app_label)s_%(class)s_name пусто',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return self.name
+
+    def clean(self) -> None:
+        self.name = self.name.strip().lower()
+        super().clean()
+
+
 class Ingredient(models.Model):
     """ингредиенты для рецепта.
 
@@ -25,9 +104,8 @@ class Ingredient(models.Model):
         name:
             Название ингредиента.
             Установлены ограничения по длине и уникальности.
-        measurement_unit:
-            Единицы измерения ингредентов (граммы, штуки, литры и т.п.).
-            Установлены ограничения по длине.
+        unit:
+            Единица измерения ингредиента (граммы, штуки, литры и т.п.).
 
     """
 
@@ -35,9 +113,11 @@ class Ingredient(models.Model):
         verbose_name='ингредиент',
         max_length=Limits.MAX_LEN_RECIPES_CHARFIELD,
     )
-    measurement_unit = models.CharField(
+    unit = models.ForeignKey(
+        Unit,
         verbose_name='единицы измерения',
-        max_length=24,
+        related_name='ingredients',
+        on_delete=models.PROTECT,
     )
 
     class Meta:
@@ -46,25 +126,20 @@ class Ingredient(models.Model):
         ordering = ('name',)
         constraints = (
             UniqueConstraint(
-                fields=('name', 'measurement_unit'),
+                fields=('name', 'unit'),
                 name='unique_for_ingredient',
             ),
             CheckConstraint(
                 check=Q(name__length__gt=0),
                 name='%(app_label)s_%(class)s_name пусто',
             ),
-            CheckConstraint(
-                check=Q(measurement_unit__length__gt=0),
-                name='%(app_label)s_%(class)s_measurement_unit пусто',
-            ),
         )
 
     def __str__(self) -> str:
-        return f'{self.name} {self.measurement_unit}'
+        return f'{self.name} {self.unit}'
 
     def clean(self) -> None:
         self.name = self.name.lower()
-        self.measurement_unit = self.measurement_unit.lower()
         super().clean()
 
 
@@ -87,6 +162,71 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_details(
+        self,
+        user: User | None = None,
+        fields: frozenset[str] | None = None,
+    ) -> 'RecipeQuerySet':
+        """Рецепты со всем, что нужно сериализатору чтения.
+
+        Автор, теги и ингредиенты загружаются заранее, признаки
+        `is_favorited` и `is_in_shopping_cart` для `user` считаются
+        подзапросами, поэтому число запросов не зависит от числа рецептов.
+
+        Args:
+            user: Пользователь, для которого считаются признаки.
+            fields: Выводимые поля `RecipeReadSerializer`, `None` - все.
+                Связи и признаки остальных полей не загружаются, из
+                таблицы рецептов читаются только нужные столбцы.
+
+        """
+        queryset = self
+        if fields is not None:
+            if 'author' not in fields:
+                queryset = queryset.select_related(None)
+            queryset = queryset.only(
+                *(
+                    field.name
+                    for field in self.model._meta.concrete_fields
+                    if field.primary_key or field.name in fields
+                ),
+            )
+        if fields is None or 'author' in fields:
+            queryset = queryset.select_related('author')
+        if fields is None or 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if fields is None or 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'ingredientrecipes',
+                    queryset=AmountIngredient.objects.select_related(
+                        'ingredients__unit',
+                    ),
+                ),
+            )
+        flags = {
+            flag: model
+            for flag, model in (
+                ('is_favorited', Favorite),
+                ('is_in_shopping_cart', Cart),
+            )
+            if fields is None or flag in fields
+        }
+        if user is None or user.is_anonymous:
+            return queryset.annotate(
+                **{flag: Value(False) for flag in flags},
+            )
+        return queryset.annotate(
+            **{
+                flag: Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk')),
+                )
+                for flag, model in flags.items()
+            },
+        )
+
+
 class Recipe(models.Model):
     """Модель для рецептов."""
 
@@ -140,6 +280,8 @@ class Recipe(models.Model):
         ),
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
@@ -165,10 +307,27 @@ class Recipe(models.Model):
         return super().clean()
 
     def save(self, *args, **kwargs) -> None:
+        # Pillow импортируется при первом сохранении, а не при загрузке
+        # моделей: командам без изображений он не нужен.
+        from PIL import Image
+
         super().save(*args, **kwargs)
-        image = Image.open(self.image.path)
-        image = image.resize(Additional.RECIPE_IMAGE_SIZE)
-        image.save(self.image.path)
+        with phase('image'), IMAGE_PROCESSING.time():
+            with span('image.open'):
+                image = Image.open(self.image.path)
+            with span('image.resize', size=Additional.RECIPE_IMAGE_SIZE):
+                image = image.resize(Additional.RECIPE_IMAGE_SIZE)
+            with span('image.save'):
+                image.save(self.image.path)
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        CartTotal.objects.apply_recipe(
+            self,
+            self.shopping_cart.values_list('user_id', flat=True),
+            sign=-1,
+        )
+        return super().delete(*args, **kwargs)
 
 
 class AmountIngredient(models.Model):
@@ -301,3 +460,249 @@ class Cart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} добавил в корзину {self.recipe}'
+
+    @transaction.atomic
+    def save(self, *args, **kwargs) -> None:
+        """Сохраняет строку корзины и обновляет итоги `CartTotal`.
+
+        Если у сохранённой строки сменились рецепт или владелец
+        (например, в админке), старая пара вычитается из итогов,
+        новая прибавляется.
+
+        """
+        stored = None
+        if not self._state.adding:
+            stored = (
+                Cart.objects.filter(pk=self.pk)
+                .values_list('user_id', 'recipe_id')
+                .first()
+            )
+            if stored == (self.user_id, self.recipe_id):
+                super().save(*args, **kwargs)
+                return
+        if stored is not None:
+            CartTotal.objects.apply_recipe(stored[1], (stored[0],), sign=-1)
+        super().save(*args, **kwargs)
+        CartTotal.objects.apply_recipe(self.recipe_id, (self.user_id,))
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        CartTotal.objects.apply_recipe(
+            self.recipe_id,
+            (self.user_id,),
+            sign=-1,
+        )
+        return super().delete(*args, **kwargs)
+
+
+class CartTotalManager(models.Manager):
+    def apply_recipe(
+        self,
+        recipe: Recipe | int,
+        user_ids: Iterable[int],
+        sign: int = 1,
+    ) -> None:
+        """Прибавляет/вычитает ингредиенты рецепта из итогов корзин.
+
+        Вызывается в той же транзакции, что и изменение корзины
+        или состава рецепта. Строки с нулевым количеством удаляются.
+
+        Args:
+            recipe: Рецепт или его `id`.
+            user_ids: `id` владельцев корзин, которые нужно обновить.
+            sign: 1 - рецепт добавлен в корзину, -1 - удален из неё.
+
+        """
+        user_ids = list(user_ids)
+        amounts = dict(
+            AmountIngredient.objects.filter(recipe=recipe).values_list(
+                'ingredients_id',
+                'amount',
+            ),
+        )
+        if not user_ids or not amounts:
+            return
+
+        totals = self.filter(user__in=user_ids, ingredient__in=amounts)
+        if sign > 0:
+            self.bulk_create(
+                [
+                    self.model(user_id=user_id, ingredient_id=ingredient_id)
+                    for user_id in user_ids
+                    for ingredient_id in amounts
+                ],
+                ignore_conflicts=True,
+            )
+        totals.update(
+            amount=Greatest(
+                F('amount')
+                + Case(
+                    *(
+                        When(
+                            ingredient=ingredient_id,
+                            then=Value(sign * amount),
+                        )
+                        for ingredient_id, amount in amounts.items()
+                    ),
+                    default=Value(0),
+                ),
+                Value(0),
+            ),
+        )
+        if sign < 0:
+            totals.filter(amount__lte=0).delete()
+
+    def summary(self, user: User) -> list[dict]:
+        """Список покупок пользователя с суммированием по величинам.
+
+        Количества одного продукта в единицах одной величины (например,
+        г и кг) переводятся в базовую единицу, складываются и выводятся
+        в наиболее крупной подходящей единице из отмеченных `is_display`.
+
+        Args:
+            user: Владелец списка покупок.
+
+        Returns:
+            list[dict]: Строки списка с ключами
+                `name`, `amount` и `measurement_unit`.
+
+        """
+        totals = self.filter(user=user).values_list(
+            'ingredient__name',
+            'amount',
+            'ingredient__unit__name',
+            'ingredient__unit__dimension',
+            'ingredient__unit__factor',
+        )
+        if not totals:
+            return []
+
+        display_units = {}
+        for unit in Unit.objects.filter(is_display=True).order_by('-factor'):
+            display_units.setdefault(unit.dimension, []).append(unit)
+
+        grouped = {}
+        for name, amount, unit, dimension, factor in totals:
+            if dimension in display_units:
+                key = name, dimension, None
+            else:
+                key, factor = (name, dimension, unit), 1
+            grouped[key] = grouped.get(key, 0) + amount * factor
+
+        summary = []
+        for (name, dimension, unit), amount in grouped.items():
+            if unit is None:
+                unit, factor = self._display_unit(
+                    display_units[dimension],
+                    amount,
+                )
+                amount = (amount / factor).quantize(Decimal('0.001'))
+            summary.append(
+                {
+                    'name': name,
+                    'amount': (
+                        amount.normalize()
+                        if amount != int(amount)
+                        else int(amount)
+                    ),
+                    'measurement_unit': unit,
+                },
+            )
+        return summary
+
+    @staticmethod
+    def _display_unit(
+        units: list[Unit],
+        amount: Decimal,
+    ) -> tuple[str, Decimal]:
+        """Выбирает крупнейшую единицу, в которой количество не меньше 1."""
+        for unit in units:
+            if amount >= unit.factor:
+                return unit.name, unit.factor
+        return units[-1].name, units[-1].factor
+
+    def rebuild(self, user_ids: Iterable[int] | None = None) -> int:
+        """Пересчитывает итоги корзин по таблицам `Cart` и `AmountIngredient`.
+
+        Args:
+            user_ids: `id` пользователей. По умолчанию - все пользователи.
+
+        Returns:
+            int: Количество созданных строк итогов.
+
+        """
+        totals = self.all()
+        cart_filter = Q(recipe__shopping_cart__isnull=False)
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            totals = totals.filter(user__in=user_ids)
+            cart_filter &= Q(recipe__shopping_cart__user__in=user_ids)
+
+        rows = (
+            AmountIngredient.objects.filter(cart_filter)
+            .values('ingredients_id', user_id=F('recipe__shopping_cart__user'))
+            .annotate(total=Sum('amount'))
+            .order_by()
+            .iterator(chunk_size=Limits.CART_TOTALS_BATCH_SIZE)
+        )
+
+        created = 0
+        with transaction.atomic():
+            totals.delete()
+            while batch := list(islice(rows, Limits.CART_TOTALS_BATCH_SIZE)):
+                self.bulk_create(
+                    self.model(
+                        user_id=row['user_id'],
+                        ingredient_id=row['ingredients_id'],
+                        amount=row['total'],
+                    )
+                    for row in batch
+                )
+                created += len(batch)
+        return created
+
+
+class CartTotal(models.Model):
+    """Итоговое количество ингредиента в корзине покупок пользователя.
+
+    Материализованная сумма `AmountIngredient.amount` по рецептам
+    из `Cart`. Обновляется при изменении корзины и состава рецептов,
+    расхождения исправляет команда `rebuild_cart_totals`.
+
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='владелец списка',
+        related_name='cart_totals',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='ингредиент',
+        related_name='cart_totals',
+        on_delete=models.CASCADE,
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    objects = CartTotalManager()
+
+    class Meta:
+        verbose_name = 'ингредиент в списке покупок'
+        verbose_name_plural = 'итоги списков покупок'
+        ordering = ('ingredient__name',)
+        constraints = (
+            UniqueConstraint(
+                fields=(
+                    'user',
+                    'ingredient',
+                ),
+                name='%(app_label)s_%(class)s ингредиент уже в итогах',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.amount} {self.ingredient}'
@@ -0,0 +1,54 @@
+"""Известные единицы измерения и их перевод в базовые единицы.
+
+Используется командой `seed_units` и подготовкой баз, схема которых
+строится без миграций (бенчмарки, бюджеты запросов). Миграция
+`0014_unit` хранит свою копию таблицы.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Model
+
+# name: (dimension, factor, is_display)
+KNOWN_UNITS = {
+    'г': ('mass', Decimal(1), True),
+    'кг': ('mass', Decimal(1000), True),
+    'мл': ('volume', Decimal(1), True),
+    'л': ('volume', Decimal(1000), True),
+    'стакан': ('volume', Decimal(200), False),
+    'ст. л.': ('volume', Decimal(15), False),
+    'ч. л.': ('volume', Decimal(5), False),
+    'капля': ('volume', Decimal('0.05'), False),
+}
+
+
+def seed_units(unit_model: type[Model]) -> int:
+    """Создаёт известные единицы или обновляет их перевод.
+
+    Единицы с теми же обозначениями, созданные раньше как штучные
+    (например, загрузкой ингредиентов), получают величину и множитель
+    из `KNOWN_UNITS`.
+
+    Args:
+        unit_model:
+            Модель `Unit`; в миграциях - историческая модель.
+
+    Returns:
+        int: Количество известных единиц.
+
+    """
+    units = unit_model.objects.bulk_create(
+        (
+            unit_model(
+                name=name,
+                dimension=dimension,
+                factor=factor,
+                is_display=is_display,
+            )
+            for name, (dimension, factor, is_display) in KNOWN_UNITS.items()
+        ),
+        update_conflicts=True,
+        unique_fields=('name',),
+        update_fields=('dimension', 'factor', 'is_display'),
+    )
+    return len(units)